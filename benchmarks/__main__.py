@@ -0,0 +1,88 @@
+"""
+python -m benchmarks run [--sizes 10 1000 ...] [--output results.json]
+python -m benchmarks compare old.json new.json [--threshold 0.1]
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from benchmarks.datasets import SECURITY, SIZES
+from benchmarks.suite import Suite
+
+
+def revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    results = Suite(args.sizes, args.repeat, args.security).run()
+    document = {
+        'revision': revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    text = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+
+
+def compare(args):
+    """Prints the benchmarks whose median changed more than the threshold,
+    exits with 1 if any of them got slower."""
+
+    def load(path):
+        with open(path) as file:
+            return {(result['name'], result['tasks'], result['security']): result
+                    for result in json.load(file)['results']}
+
+    old, new = load(args.old), load(args.new)
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        ratio = new[key]['median'] / old[key]['median'] if old[key]['median'] else 1.0
+        if abs(ratio - 1) > args.threshold:
+            regressions += ratio > 1
+            name, tasks, security = key
+            print(f'{name:<22}{tasks:>9} {security:<9}'
+                  f'{old[key]["median"]:>12.6f}{new[key]["median"]:>12.6f}{ratio:>8.2f}x')
+    sys.exit(1 if regressions else 0)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES),
+                            help='numbers of tasks, up to 1000000')
+    run_parser.add_argument('--security', nargs='+', choices=list(SECURITY),
+                            default=list(SECURITY))
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--output', help='JSON file, stdout by default')
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.1)
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,51 @@
+"""Synthetic users for the benchmarks."""
+
+import datetime
+import random
+
+
+# Security configurations: the password of the user, every configuration
+# but 'none' is encrypted with the strategy of the same name.
+SECURITY = {
+    'none': None,
+    'vigenere': 'ab12',
+    'caesar': 'secret-key',
+    'keystream': 'secret-key',
+}
+
+SIZES = (10, 1_000, 100_000)
+WORDS = ('write', 'report', 'review', 'lab', 'exam', 'fix', 'plan', 'call',
+         'read', 'chapter', 'deploy', 'meeting', 'draft', 'email', 'notes')
+
+
+def make_user_data(user_name, tasks, objectives=None, seed=0):
+    """Generates the data of a user with the given number of tasks,
+    spread over the objectives (about 100 tasks per objective by default)."""
+
+    rng = random.Random(seed)
+    objectives = objectives or max(1, tasks // 100)
+    start = datetime.date(2024, 1, 1)
+
+    user_data = {'user_name': user_name, 'objectives': []}
+    for number in range(objectives):
+        title = f'{rng.choice(WORDS)} {rng.choice(WORDS)} {number}'
+        user_data['objectives'].append({'title': title, 'tasks': []})
+
+    for number in range(tasks):
+        objective = user_data['objectives'][number % objectives]
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 5)))
+        due_date = start + datetime.timedelta(days=rng.randrange(1000))
+        objective['tasks'].append({'title': f'{title} {number}', 'due_date': str(due_date)})
+
+    return user_data
+
+
+def make_user(user_name, security):
+    """Creates the user and the strategy of a security configuration."""
+
+    from domain.factory import UserFactory, StrategyFactory
+
+    password = SECURITY[security]
+    name = security if password else None
+    return (UserFactory().create_user(user_name, password),
+            StrategyFactory().create(password, name))
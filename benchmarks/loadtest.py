@@ -0,0 +1,267 @@
+"""
+Load test of the DB file store: worker threads or processes replay a mix
+of commands (AddObjective, AddTask, ModifyTaskDate and undo) through the
+managers against a temporary DB directory, several workers per user if
+there are fewer users than workers.
+
+Every worker has a DB of its own, as a separate session would, so the
+thread mode does not share the indexes and the lock of a single store.
+Every worker keeps a model of what its commands should have left in the
+file. At the end the files are read again with a fresh DB: a file that
+cannot be read is corrupt, and whatever a model has that its file does
+not is a lost update.
+
+python -m benchmarks.loadtest [--workers 8] [--users 8] [--ops 200]
+                              [--mode thread|process] [--async]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from benchmarks.datasets import SECURITY, make_user
+
+
+# How often each command is chosen.
+MIX = {
+    'AddObjective': 0.1,
+    'AddTask': 0.5,
+    'ModifyTaskDate': 0.3,
+    'undo': 0.1,
+}
+
+
+def percentile(values, fraction):
+    """Nearest rank percentile of the sorted values."""
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def _number(user_data, title):
+    """The number of the objective with the title, None if it is gone."""
+    for number, objective in enumerate(user_data['objectives'], 1):
+        if objective['title'] == title:
+            return number
+    return None
+
+
+def run_worker(directory, worker, user_name, security, ops, seed, write_behind):
+    """Replays ops random commands as one user, in a thread or a process.
+
+    Returns the latencies of every command, the number of commands that
+    failed and of the reads that failed, and the model: the objectives the worker added, and the due
+    date of every task it added, by (objective title, task title).
+    """
+
+    from domain.models.logic import (
+        DB, AsyncDB, SecurityContext, Caretaker, Invoker,
+        ObjectivesManager, TasksManager, AddObjective, AddTask, ModifyTaskDate)
+
+    # Not the DB shared by the process, the workers are separate sessions.
+    user, strategy = make_user(user_name, security)
+    db = DB.new(SecurityContext(strategy))
+    db.directory = directory
+    if write_behind:
+        db = AsyncDB(db)
+    objectives_manager = ObjectivesManager(db, user)
+    tasks_manager = TasksManager(db, user)
+    caretaker = Caretaker()
+
+    rng = random.Random(seed)
+    objectives, tasks = [], {}
+    undo = []
+    latencies = {command: [] for command in MIX}
+    errors = {command: 0 for command in MIX}
+    read_errors = 0
+
+    for op in range(ops):
+        command = rng.choices(list(MIX), weights=list(MIX.values()))[0]
+        if command == 'AddTask' and not objectives:
+            command = 'AddObjective'
+        if command == 'ModifyTaskDate' and not tasks:
+            command = 'AddTask' if objectives else 'AddObjective'
+
+        # Where things are is looked up untimed, like a user reading the page.
+        # A read can fail while another process is writing the file.
+        try:
+            user_data = db.get_user_data(user)
+        except Exception:
+            user_data = None
+        if not user_data or None in user_data['objectives']:
+            read_errors += 1
+            continue
+        if command == 'AddObjective':
+            title = f'w{worker} objective {op}'
+            manager, request = objectives_manager, AddObjective(objectives_manager, title)
+            apply, revert = (lambda: objectives.append(title),
+                             lambda title=title: objectives.remove(title))
+        elif command == 'AddTask':
+            objective = rng.choice(objectives)
+            key = (objective, f'w{worker} task {op}')
+            manager, request = tasks_manager, AddTask(
+                tasks_manager, key[1], '2025-01-01', _number(user_data, objective))
+            apply, revert = (lambda: tasks.__setitem__(key, '2025-01-01'),
+                             lambda key=key: tasks.pop(key))
+        elif command == 'ModifyTaskDate':
+            key = rng.choice(list(tasks))
+            number = _number(user_data, key[0])
+            titles = ([task['title'] for task in user_data['objectives'][number - 1]['tasks']]
+                      if number else [])
+            task_number = titles.index(key[1]) + 1 if key[1] in titles else None
+            date, old_date = f'2025-{op % 12 + 1:02d}-{op % 28 + 1:02d}', tasks[key]
+            manager, request = tasks_manager, ModifyTaskDate(
+                tasks_manager, date, task_number, number)
+            apply, revert = (lambda: tasks.__setitem__(key, date),
+                             lambda key=key, date=old_date: tasks.__setitem__(key, date))
+
+        if command != 'undo':
+            # The undo entry is taken from the data on the page, as in the App.
+            manager.user_data = user_data
+
+        start = time.perf_counter()
+        try:
+            if command == 'undo':
+                memento = caretaker.get_memento()
+                if memento:
+                    memento.restore()
+                    undo.pop()()
+            else:
+                memento = manager.save()
+                version = db.version(user.name)
+                Invoker(request).execute_command()
+                if db.version(user.name) != version:
+                    caretaker.add_memento(memento)
+                    undo.append(revert)
+                    apply()
+        except Exception:
+            errors[command] += 1
+        latencies[command].append(time.perf_counter() - start)
+
+    if write_behind:
+        db.flush()
+    return {
+        'user_name': user_name,
+        'latencies': latencies,
+        'errors': errors,
+        'read_errors': read_errors,
+        'objectives': objectives,
+        'tasks': tasks,
+    }
+
+
+def check(directory, security, results):
+    """Reads every file with a fresh DB, returns the corrupt files and the
+    lost updates of the workers."""
+
+    from domain.models.logic import DB, SecurityContext
+
+    db = DB.new(SecurityContext(make_user('', security)[1]))
+    db.directory = directory
+
+    corrupt, lost = [], []
+    files = {}
+    for user_name in sorted({result['user_name'] for result in results}):
+        user = make_user(user_name, security)[0]
+        try:
+            user_data = db.get_user_data(user)
+        except Exception:
+            user_data = None
+        if not user_data or None in user_data['objectives']:
+            corrupt.append(user_name)
+            continue
+        files[user_name] = {
+            objective['title']: {task['title']: task['due_date'] for task in objective['tasks']}
+            for objective in user_data['objectives']}
+
+    for result in results:
+        found = files.get(result['user_name'])
+        if found is None:
+            continue
+        for objective in result['objectives']:
+            if objective not in found:
+                lost.append({'user_name': result['user_name'], 'objective': objective})
+        for (objective, task), due_date in result['tasks'].items():
+            if found.get(objective, {}).get(task) != due_date:
+                lost.append({'user_name': result['user_name'], 'objective': objective,
+                             'task': task, 'due_date': due_date,
+                             'found': found.get(objective, {}).get(task)})
+
+    corrupt += [file_name for file_name in os.listdir(directory)
+                if file_name.endswith('.tmp')]
+    return corrupt, lost
+
+
+def run(workers, users, ops, mode='thread', write_behind=False, security='keystream',
+        seed=0, directory=None):
+    """Runs the load test and returns its report."""
+
+    with tempfile.TemporaryDirectory() as temporary:
+        directory = directory or temporary
+        os.makedirs(directory, exist_ok=True)
+        jobs = [(directory, worker, f'load{worker % users}', security, ops,
+                 seed + worker, write_behind)
+                for worker in range(workers)]
+
+        Executor = ProcessPoolExecutor if mode == 'process' else ThreadPoolExecutor
+        start = time.perf_counter()
+        with Executor(max_workers=workers) as executor:
+            results = list(executor.map(run_worker, *zip(*jobs)))
+        elapsed = time.perf_counter() - start
+
+        corrupt, lost = check(directory, security, results)
+
+    commands = {}
+    for command in MIX:
+        values = sorted(value for result in results for value in result['latencies'][command])
+        if values:
+            commands[command] = {
+                'count': len(values),
+                'errors': sum(result['errors'][command] for result in results),
+                'mean': sum(values) / len(values),
+                'p50': percentile(values, 0.50),
+                'p95': percentile(values, 0.95),
+                'p99': percentile(values, 0.99),
+            }
+    total = sum(command['count'] for command in commands.values())
+    return {
+        'mode': mode,
+        'write_behind': write_behind,
+        'security': security,
+        'workers': workers,
+        'users': users,
+        'ops': total,
+        'seconds': elapsed,
+        'throughput': total / elapsed,
+        'commands': commands,
+        'read_errors': sum(result['read_errors'] for result in results),
+        'lost_updates': len(lost),
+        'lost': lost[:20],
+        'corrupt_files': corrupt,
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.loadtest')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--users', type=int, default=None,
+                        help='number of users, one per worker by default')
+    parser.add_argument('--ops', type=int, default=200, help='commands per worker')
+    parser.add_argument('--mode', choices=['thread', 'process'], default='thread')
+    parser.add_argument('--async', dest='write_behind', action='store_true',
+                        help='save through the AsyncDB write-behind proxy')
+    parser.add_argument('--security', choices=list(SECURITY), default='keystream')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--directory', help='DB directory, a temporary one by default')
+    args = parser.parse_args(argv)
+
+    report = run(args.workers, args.users or args.workers, args.ops, args.mode,
+                 args.write_behind, args.security, args.seed, args.directory)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,89 @@
+"""
+Startup time of the client: from the start of the process to the first
+frame of the objectives page, for users of different sizes.
+
+python -m benchmarks.startup [--sizes 10 1000 ...] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.datasets import SECURITY, make_user, make_user_data
+
+
+CLIENT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'client.py')
+APP_PASSWORD = 'app123'
+FIRST_FRAME = b'Command: '
+
+
+def time_to_first_frame(directory, user_name, password):
+    """Starts the client in the directory and returns the seconds until it
+    asks for the first command."""
+
+    answers = f'{APP_PASSWORD}\n{user_name}\n{password or "-"}\n'.encode()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, CLIENT], cwd=directory,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    process.stdin.write(answers)
+    process.stdin.flush()
+
+    output = b''
+    while FIRST_FRAME not in output:
+        chunk = os.read(process.stdout.fileno(), 65536)
+        if not chunk:
+            raise RuntimeError('the client exited before the first frame')
+        output += chunk
+    elapsed = time.perf_counter() - start
+
+    process.stdin.close()
+    process.wait()
+    return elapsed
+
+
+def run(sizes, repeat, security):
+    from domain.models.logic import DB, SecurityContext
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        db = DB.new(SecurityContext(None))
+        db.directory = os.path.join(directory, 'DB')
+        os.mkdir(db.directory)
+        for tasks in sizes:
+            for config in security:
+                user, strategy = make_user(f'startup{tasks}{config}', config)
+                db.password_manager = SecurityContext(strategy)
+                db.save_user_data(user, make_user_data(user.name, tasks))
+
+                times = [time_to_first_frame(directory, user.name, user.password)
+                         for _ in range(repeat)]
+                results.append({
+                    'name': 'startup.first_frame',
+                    'tasks': tasks,
+                    'security': config,
+                    'min': min(times),
+                    'median': statistics.median(times),
+                    'mean': statistics.fmean(times),
+                    'repeat': repeat,
+                })
+    return results
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1_000, 10_000])
+    parser.add_argument('--security', nargs='+', choices=list(SECURITY),
+                        default=list(SECURITY))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+    print(json.dumps({'results': run(args.sizes, args.repeat, args.security)}, indent=2))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,145 @@
+"""
+The benchmarks: DB loads and saves, the ciphers, the manager operations
+and the page rendering, timed on synthetic users.
+"""
+
+import contextlib
+import copy
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.datasets import SECURITY, make_user, make_user_data
+
+
+def measure(function, repeat, setup=None):
+    """Times the function, calling setup (untimed) before every run."""
+
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'repeat': repeat,
+    }
+
+
+class Suite:
+    """Runs every benchmark for every size and security configuration."""
+
+    def __init__(self, sizes, repeat=3, security=tuple(SECURITY)):
+        self.sizes = sizes
+        self.repeat = repeat
+        self.security = security
+        self.results = []
+
+    def record(self, name, tasks, security, timing):
+        self.results.append(
+            {'name': name, 'tasks': tasks, 'security': security, **timing})
+
+    def run(self):
+        from domain.models.logic import DB, SecurityContext
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.db = DB.new(SecurityContext(None))
+            self.db.directory = directory
+            for tasks in self.sizes:
+                user_data = make_user_data('bench', tasks)
+                for security in self.security:
+                    user, strategy = make_user('bench', security)
+                    self.db.password_manager = SecurityContext(strategy)
+                    self.db.save_user_data(user, user_data)
+
+                    self.bench_db(user, user_data, tasks, security)
+                    if user.password:
+                        self.bench_cipher(user, user_data, tasks, security)
+                    self.bench_managers(user, user_data, tasks, security)
+                    self.bench_pages(user_data, tasks, security)
+        return self.results
+
+    def bench_db(self, user, user_data, tasks, security):
+        db = self.db
+        path = db.path(user.name)
+        self.record('db.get_user_data', tasks, security,
+                    measure(lambda: db.get_user_data(user), self.repeat))
+
+        # Without its file the DB encrypts and writes every record again.
+        rewrite = lambda: (os.remove(path), db.save_user_data(user, user_data))
+        self.record('db.save_rewrite', tasks, security,
+                    measure(lambda: db.save_user_data(user, user_data), self.repeat,
+                            lambda: os.remove(path)))
+
+        # One due date changed: a single record is encrypted and appended.
+        changed = copy.deepcopy(user_data)
+        changed['objectives'][0]['tasks'][0]['due_date'] = '2099-12-31'
+        self.record('db.save_one_record', tasks, security,
+                    measure(lambda: db.save_user_data(user, changed), self.repeat, rewrite))
+        db.save_user_data(user, user_data)
+
+    def bench_cipher(self, user, user_data, tasks, security):
+        cipher = self.db.password_manager
+        keys = {'key1': len(user.password), 'key2': user.password}
+        message = str(user_data)
+        encrypted = cipher.encrypt(message=message, **keys)
+        # The whole user data in one message, a few MB for the larger sizes.
+        size = {'bytes': len(message.encode())}
+        self.record('cipher.encrypt', tasks, security,
+                    {**measure(lambda: cipher.encrypt(message=message, **keys), self.repeat),
+                     **size})
+        self.record('cipher.decrypt', tasks, security,
+                    {**measure(lambda: cipher.decrypt(encrypted_message=encrypted, **keys),
+                               self.repeat),
+                     **size})
+
+    def bench_managers(self, user, user_data, tasks, security):
+        from domain.models.logic import ObjectivesManager, TasksManager
+
+        db = self.db
+        objectives = ObjectivesManager(db, user)
+        tasks_manager = TasksManager(db, user)
+        reset = lambda: db.save_user_data(user, user_data)
+
+        operations = {
+            'objectives.add': lambda: objectives.add('new objective'),
+            'objectives.modify': lambda: objectives.modify('renamed', 1),
+            'objectives.delete': lambda: objectives.delete(1),
+            'tasks.add': lambda: tasks_manager.add('new task', '2025-01-01', 1),
+            'tasks.modify': lambda: tasks_manager.modify('renamed', '2025-01-02', 1, 1),
+            'tasks.modify_name': lambda: tasks_manager.modify_name('renamed', 1, 1),
+            'tasks.modify_date': lambda: tasks_manager.modify_date('2025-01-03', 1, 1),
+            'tasks.delete': lambda: tasks_manager.delete(1, 1),
+        }
+        for name, operation in operations.items():
+            self.record(name, tasks, security, measure(operation, self.repeat, reset))
+        reset()
+
+    def bench_pages(self, user_data, tasks, security):
+        from domain.models.UI import (
+            Header, HeaderDecorator, ObjectivesPageBuilder, ObjectivesUIList,
+            ObjectivesUIBasicCommands, TasksPageBuilder, TasksUIList,
+            TasksUIBasicCommands, TasksUICommandsDecorator)
+
+        header = HeaderDecorator(Header(user_data), SECURITY[security])
+        builders = {
+            'page.objectives': ObjectivesPageBuilder(
+                header, ObjectivesUIList(user_data), ObjectivesUIBasicCommands()),
+            'page.tasks': TasksPageBuilder(
+                header, TasksUIList(user_data),
+                TasksUICommandsDecorator(TasksUIBasicCommands())),
+        }
+        with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+            for name, builder in builders.items():
+                builder.create_header()
+                builder.create_body()
+                builder.create_footer()
+                page = builder.get_page()
+                page.body.obj_num = 1
+                self.record(name, tasks, security,
+                            measure(lambda: page.display_page(user_data), self.repeat))
@@ -1,10 +1,28 @@
 """Code for user interaction."""
 
-from abc import ABC, abstractmethod
-
-from domain.models.UI import *
-from domain.factory import UserFactory, ManagerFactory
-from domain.models.logic import *
+import datetime
+import re
+import sys
+
+try:
+    import readline
+except ImportError:
+    readline = None
+
+from domain.models.UI import (
+    LoginUI, Header, HeaderDecorator, StatsUI, MemoryUI,
+    ObjectivesPageBuilder, ObjectivesUIList, ObjectivesUIBasicCommands,
+    ObjectivesUICommandsDecorator, TasksPageBuilder, TasksUIList,
+    TasksUIOptionalCommands, TasksUICommandsDecorator)
+from domain.factory import UserFactory, ManagerFactory, StrategyFactory
+from domain.models.dates import parse_date
+from domain.models.diagnostics import MemoryReport
+from domain.models.trie import TitleIndex
+from domain.models.logic import (
+    DB, AsyncDB, FileWatcher, SecurityContext, Caretaker, Invoker,
+    AddObjective, DeleteObjective, ModifyObjective,
+    AddTask, DeleteTask, ModifyTask, ModifyTaskName, ModifyTaskDate,
+    ClearTasks, DeleteTasks, MoveTasks, CopyTasks)
 
 
 class AppProxy:
@@ -22,6 +40,10 @@ class AppProxy:
             self.app.run()
 
 
+# An answer made of these is numbers, anything else is the start of a title.
+NUMBERS = re.compile(r'[\d\s,-]+')
+
+
 class App:
     """The class of the application."""
 
@@ -29,6 +51,159 @@ class App:
         self.login_ui  = LoginUI()
         self.user_factory = UserFactory()
         self.manager_factory = ManagerFactory()
+        self.strategy_factory = StrategyFactory()
+        self.memory_report = MemoryReport()
+
+
+    @property
+    def objectives_page(self):
+        if self._objectives_page is None:
+            objectives_page_builder = ObjectivesPageBuilder(
+                header=self.header, 
+                objectives=ObjectivesUIList(self.user_data),
+                commands=ObjectivesUICommandsDecorator(ObjectivesUIBasicCommands()))
+            objectives_page_builder.create_header()
+            objectives_page_builder.create_body()
+            objectives_page_builder.create_footer()
+            self._objectives_page = objectives_page_builder.get_page()
+        return self._objectives_page
+
+    @property
+    def tasks_page(self):
+        if self._tasks_page is None:
+            tasks_page_builder = TasksPageBuilder(
+                header=self.header,
+                tasks=TasksUIList(self.user_data),
+                commands=TasksUICommandsDecorator(TasksUIOptionalCommands()))
+            tasks_page_builder.create_header()
+            tasks_page_builder.create_body()
+            tasks_page_builder.create_footer()
+            self._tasks_page = tasks_page_builder.get_page()
+        return self._tasks_page
+
+    @property
+    def objectives_manager(self):
+        if self._objectives_manager is None:
+            self._objectives_manager = self.manager_factory.create(
+                "objectives", self.db, self.user, self.user_data)
+            self._objectives_manager.observers.append(self.titles)
+        return self._objectives_manager
+
+    @property
+    def tasks_manager(self):
+        if self._tasks_manager is None:
+            self._tasks_manager = self.manager_factory.create(
+                "tasks", self.db, self.user, self.user_data)
+            self._tasks_manager.observers.append(self.titles)
+        return self._tasks_manager
+
+
+    def ask_objective(self, prompt='Objective number: '):
+        """Asks for an objective by its number or the start of its title."""
+        return self.ask(
+            prompt,
+            lambda answer: self.titles.objective_number(answer, self.user_data),
+            lambda answer: self.titles.complete(answer, self.user_data))
+
+
+    def ask_tasks(self, objective_number, prompt='Task number: '):
+        """Asks for tasks by their numbers on the page, or for one by the
+        start of its title."""
+        return self.ask(
+            prompt,
+            lambda answer: self.titles.task_number(objective_number, answer, self.user_data),
+            lambda answer: self.titles.complete(answer, self.user_data, objective_number),
+            self.tasks_page.body.to_storage)
+
+
+    def ask(self, prompt, resolve, complete, numbers=lambda answer: answer):
+        """Asks until the answer is numbers or the start of a single title,
+        listing the titles that start with it otherwise. Tab completes the
+        titles in a terminal."""
+
+        if readline:
+            readline.set_completer(
+                lambda text, state: (complete(text) + [None])[state])
+        try:
+            while True:
+                answer = input(' '*3 + prompt)
+                if not answer or NUMBERS.fullmatch(answer):
+                    return numbers(answer)
+                number = resolve(answer)
+                if number:
+                    return number
+                matches = complete(answer)
+                if matches:
+                    print(' '*3 + 'Matches: ' + ' | '.join(matches))
+                else:
+                    print(' '*3 + 'No title starts with ' + answer)
+        finally:
+            if readline:
+                readline.set_completer(None)
+
+
+    def load_user_data(self):
+        """Returns the user data, loaded again only if it was saved since
+        it was last loaded."""
+
+        version = self.db.version(self.user.name)
+        if version != self.user_data_version:
+            self.user_data = self.db.get_user_data(self.user)
+            self.user_data_version = version
+        return self.user_data
+
+
+    def execute(self, request, page, caretaker, memento):
+        """Executes the command. Only if it changed the user data is the
+        undo entry kept, the data loaded again and the page redrawn."""
+
+        version = self.db.version(self.user.name)
+        Invoker(request).execute_command()
+        if self.db.version(self.user.name) != version:
+            caretaker.add_memento(memento)
+            self.invalidate_orders()
+            page.display_page(self.load_user_data())
+        # The command and the reload took the prefetched data, the next
+        # command reads it again.
+        self.db.prefetch(self.user)
+
+
+    def invalidate_orders(self):
+        """The tasks page sorts and filters the tasks again at its next
+        display, a change can keep the tasks list and its length."""
+        if self._tasks_page:
+            self._tasks_page.body.invalidate()
+
+
+    def refresh(self, opened_tasks_ui):
+        """Reloads the data changed by someone else, and redraws the page
+        only if what it shows has changed. Returns if the tasks page is
+        still open."""
+
+        user_data = self.db.reload_user_data(self.user, self.user_data)
+        if not user_data:
+            return opened_tasks_ui
+        old_data, self.user_data = self.user_data, user_data
+        self.titles.reset(user_data)
+        self.invalidate_orders()
+        for manager in (self._objectives_manager, self._tasks_manager):
+            if manager:
+                manager.user_data = user_data
+        self.db.prefetch(self.user)
+
+        if opened_tasks_ui:
+            index = int(self.tasks_page.body.obj_num) - 1
+            if index >= len(user_data['objectives']):
+                # The open objective is gone.
+                self.objectives_page.display_page(user_data)
+                return False
+            if old_data['objectives'][index] != user_data['objectives'][index]:
+                self.tasks_page.display_page(user_data)
+        else:
+            titles = lambda data: [objective['title'] for objective in data['objectives']]
+            if titles(old_data) != titles(user_data):
+                self.objectives_page.display_page(user_data)
+        return opened_tasks_ui
 
 
     def run(self):
@@ -40,38 +215,30 @@ class App:
             user = self.user_factory.create_user(user_name, password)
 
             # Choose the security strategy
-            if len(password) < 5:
-                strategy = VigenereCipherAdapter(VigenereCipher(None))
-            else:
-                strategy = CaesarCipher()
+            strategy = self.strategy_factory.create(password)
             self.db = DB(SecurityContext(strategy))
 
             self.user_data = self.db.get_user_data(user)
+
+        # From now on the saves are written behind by a background thread.
+        self.db = AsyncDB(self.db)
        
-        header_object = HeaderDecorator(Header(self.user_data), password)
-        objectives_page_builder = ObjectivesPageBuilder(
-            header=header_object, 
-            objectives=ObjectivesUIList(self.user_data),
-            commands=ObjectivesUIBasicCommands())
-        objectives_page_builder.create_header()
-        objectives_page_builder.create_body()
-        objectives_page_builder.create_footer()
-        self.objectives_page = objectives_page_builder.get_page()
-
-        tasks_page_builder = TasksPageBuilder(
-            header=header_object,
-            tasks=TasksUIList(self.user_data),
-            commands=TasksUICommandsDecorator(TasksUIBasicCommands()))
-        tasks_page_builder.create_header()
-        tasks_page_builder.create_body()
-        tasks_page_builder.create_footer()
-        self.tasks_page = tasks_page_builder.get_page()
-
-
-        self.tasks_manager = self.manager_factory.create("tasks", self.db, user)
-        self.objectives_manager = self.manager_factory.create("objectives", self.db, user)
-        
+        # The pages and the managers are built when they are first used,
+        # from the data that was just loaded.
+        self.user = user
+        self.user_data_version = self.db.version(user.name)
+        self.titles = TitleIndex(self.user_data)
+        if readline and sys.stdin.isatty():
+            readline.set_completer_delims('')
+            readline.parse_and_bind('tab: complete')
+        self.header = HeaderDecorator(Header(self.user_data), password)
+        self._objectives_page = self._tasks_page = None
+        self._objectives_manager = self._tasks_manager = None
+
         self.objectives_page.display_page(self.user_data)
+        # The managers read the data again before every command.
+        self.db.prefetch(user)
+        self.watcher = FileWatcher(self.db, user.name)
 
         tasks_caretaker = Caretaker()
         objectives_caretaker = Caretaker()
@@ -79,6 +246,8 @@ class App:
         opened_tasks_ui = False
         while True:
             command = input('Command: ')
+            if self.watcher.changed():
+                opened_tasks_ui = self.refresh(opened_tasks_ui)
             if not opened_tasks_ui:
                 if command == '<':
                     self.user_data = None
@@ -87,10 +256,7 @@ class App:
                         user = self.user_factory.create_user(user_name, password)
 
                         # Choose the security strategy
-                        if len(password) < 5:
-                            strategy = VigenereCipherAdapter(VigenereCipher(None))
-                        else:
-                            strategy = CaesarCipher()
+                        strategy = self.strategy_factory.create(password)
                         self.db.password_manager = SecurityContext(strategy)
 
                         self.user_data = self.db.get_user_data(user)
@@ -98,13 +264,18 @@ class App:
                     tasks_caretaker = Caretaker()
                     objectives_caretaker = Caretaker()
 
-                    self.objectives_manager.user, self.tasks_manager.user = user, user
-                    self.objectives_manager.db, self.tasks_manager.db = self.db, self.db
-                    self.objectives_page.header.password = password
+                    self.user = user
+                    self.user_data_version = self.db.version(user.name)
+                    self.titles.reset(self.user_data)
+                    for manager in (self._objectives_manager, self._tasks_manager):
+                        if manager:
+                            manager.user, manager.db = user, self.db
+                    self.header.password = password
                     self.objectives_page.display_page(self.user_data)
+                    self.db.prefetch(user)
+                    self.watcher = FileWatcher(self.db, user.name)
                 elif command == '+':
                     memento = self.objectives_manager.save()
-                    objectives_caretaker.add_memento(memento)
 
                     objective_name = input(' '*3 + 'Objective name: ')
 
@@ -112,37 +283,31 @@ class App:
                         receiver=self.objectives_manager, 
                         objective_name=objective_name
                     )
-                    Invoker(request).execute_command()
-
-                    self.user_data = self.db.get_user_data(user)
-                    self.objectives_page.display_page(self.user_data)
+                    self.execute(request, self.objectives_page, objectives_caretaker, memento)
                 elif command == '-':
                     memento = self.objectives_manager.save()
-                    objectives_caretaker.add_memento(memento)
 
-                    objective_number = input(' '*3 + 'Objective number: ')
+                    objective_number = self.ask_objective()
 
                     request = DeleteObjective(
                         receiver=self.objectives_manager, 
                         objective_number=objective_number
                     )
-                    Invoker(request).execute_command()
-
-                    self.user_data = self.db.get_user_data(user)
-                    self.objectives_page.display_page(self.user_data)
+                    self.execute(request, self.objectives_page, objectives_caretaker, memento)
                 elif command == 'o':
-                    objective_number = input(' '*3 + 'Objective number: ')
-                    self.user_data = self.db.get_user_data(user)
+                    objective_number = self.ask_objective()
+                    self.load_user_data()
+                    # The sorting is kept, the filters were for the last objective.
+                    self.tasks_page.body.set_view(self.tasks_page.body.sort_by)
                     self.tasks_page.body.obj_num = objective_number
                     self.tasks_page.display_page(self.user_data)
-                    self.tasks_manager.user_data = self.db.get_user_data(user)
+                    self.tasks_manager.user_data = self.user_data
                     opened_tasks_ui = True
                     tasks_caretaker = Caretaker()
                 elif command == 'm':
                     memento = self.objectives_manager.save()
-                    objectives_caretaker.add_memento(memento)
 
-                    objective_number = input(' '*3 + 'Objective number: ')
+                    objective_number = self.ask_objective()
                     new_title = input(' '*3 + 'New title: ')
 
                     request = ModifyObjective(
@@ -150,24 +315,44 @@ class App:
                         objective_number=objective_number,
                         objective_title=new_title
                     )
-                    Invoker(request).execute_command()
-
-                    self.user_data = self.db.get_user_data(user)
-                    self.objectives_page.display_page(self.user_data)
+                    self.execute(request, self.objectives_page, objectives_caretaker, memento)
                 elif command == 'u':
                     memento = objectives_caretaker.get_memento()
-                    if memento:
-                        memento.restore()
-                        self.objectives_page.display_page(memento.user_data)
+                    if memento and memento.restore():
+                        self.user_data = memento.user_data
+                        self.user_data_version = self.db.version(user.name)
+                        self.titles.reset(self.user_data)
+                        self.invalidate_orders()
+                        self.objectives_page.display_page(self.user_data)
+                elif command == 's':
+                    try:
+                        # NumPy is only imported when the stats are asked for.
+                        from domain.models.stats import TaskColumns, TaskStats
+                        columns = TaskColumns.from_user_data([self.user_data])
+                        StatsUI().display(TaskStats(columns).report())
+                    except ImportError as error:
+                        print(error)
+                elif command == 'mem':
+                    managers = [manager for manager in
+                                (self._objectives_manager, self._tasks_manager) if manager]
+                    report = self.memory_report.report({
+                        'user data': [self.user_data] + [manager.user_data for manager in managers],
+                        'undo history': [objectives_caretaker, tasks_caretaker],
+                        'caches': [self.db],
+                        'pages': [page for page in
+                                  (self._objectives_page, self._tasks_page) if page],
+                        'managers': managers,
+                    })
+                    MemoryUI().display(report)
             else:
                 if command == '<':
-                    self.user_data = self.db.get_user_data(user)
+                    self.load_user_data()
                     self.objectives_manager.user_data = self.user_data
                     self.objectives_page.display_page(self.user_data)
+                    self.db.prefetch(user)
                     opened_tasks_ui = False
                 elif command == '+':
                     memento = self.tasks_manager.save()
-                    tasks_caretaker.add_memento(memento)
 
                     task_title = input(' '*3 + 'Task name: ')
                     due_date = input(' '*3 + 'Due date: ')
@@ -178,32 +363,22 @@ class App:
                         due_date=due_date, 
                         objective_number=objective_number
                     )
-                    Invoker(request).execute_command()
-
-                    self.user_data = self.db.get_user_data(user)
-                    self.tasks_page.body.obj_num = objective_number
-                    self.tasks_page.display_page(self.user_data)
+                    self.execute(request, self.tasks_page, tasks_caretaker, memento)
                 elif command == '-':
                     memento = self.tasks_manager.save()
-                    tasks_caretaker.add_memento(memento)
 
-                    task_number = input(' '*3 + 'Task number: ')
+                    task_number = self.ask_tasks(objective_number)
 
                     request = DeleteTask(
                         receiver=self.tasks_manager, 
                         task_number=task_number,
                         objective_number=objective_number
                     )
-                    Invoker(request).execute_command()
-
-                    self.user_data = self.db.get_user_data(user)
-                    self.tasks_page.body.obj_num = objective_number
-                    self.tasks_page.display_page(self.user_data)
+                    self.execute(request, self.tasks_page, tasks_caretaker, memento)
                 elif command == 'm':
                     memento = self.tasks_manager.save()
-                    tasks_caretaker.add_memento(memento)
 
-                    task_number = input(' '*3 + 'Task number: ')
+                    task_number = self.ask_tasks(objective_number)
                     new_title = input(' '*3 + 'New title: ')
                     new_dd = input(' '*3 + 'New due date: ')
 
@@ -214,16 +389,11 @@ class App:
                         task_number=task_number, 
                         objective_number=objective_number
                     )
-                    Invoker(request).execute_command()
-
-                    self.user_data = self.db.get_user_data(user)
-                    self.tasks_page.body.obj_num = objective_number
-                    self.tasks_page.display_page(self.user_data)
+                    self.execute(request, self.tasks_page, tasks_caretaker, memento)
                 elif command == 'mn':
                     memento = self.tasks_manager.save()
-                    tasks_caretaker.add_memento(memento)
 
-                    task_number = input(' '*3 + 'Task number: ')
+                    task_number = self.ask_tasks(objective_number)
                     new_title = input(' '*3 + 'New title: ')
 
                     request = ModifyTaskName(
@@ -232,16 +402,11 @@ class App:
                         task_number=task_number, 
                         objective_number=objective_number
                     )
-                    Invoker(request).execute_command()
-
-                    self.user_data = self.db.get_user_data(user)
-                    self.tasks_page.body.obj_num = objective_number
-                    self.tasks_page.display_page(self.user_data)
+                    self.execute(request, self.tasks_page, tasks_caretaker, memento)
                 elif command == 'md':
                     memento = self.tasks_manager.save()
-                    tasks_caretaker.add_memento(memento)
 
-                    task_number = input(' '*3 + 'Task number: ')
+                    task_number = self.ask_tasks(objective_number)
                     new_dd = input(' '*3 + 'New due date: ')
 
                     request = ModifyTaskDate(
@@ -250,17 +415,80 @@ class App:
                         task_number=task_number, 
                         objective_number=objective_number
                     )
-                    Invoker(request).execute_command()
+                    self.execute(request, self.tasks_page, tasks_caretaker, memento)
+                elif command == 'X':
+                    memento = self.tasks_manager.save()
 
-                    self.user_data = self.db.get_user_data(user)
-                    self.tasks_page.body.obj_num = objective_number
+                    request = ClearTasks(
+                        receiver=self.tasks_manager,
+                        objective_number=objective_number
+                    )
+                    self.execute(request, self.tasks_page, tasks_caretaker, memento)
+                elif command == 'U':
+                    memento = self.tasks_manager.save()
+
+                    task_numbers = self.ask_tasks(
+                        objective_number, 'Task numbers (e.g. 1,3,5-7): ')
+
+                    request = DeleteTasks(
+                        receiver=self.tasks_manager,
+                        task_numbers=task_numbers,
+                        objective_number=objective_number
+                    )
+                    self.execute(request, self.tasks_page, tasks_caretaker, memento)
+                elif command in ('mv', 'cp'):
+                    memento = self.tasks_manager.save()
+
+                    task_numbers = self.ask_tasks(
+                        objective_number, 'Task numbers (e.g. 1,3,5-7): ')
+                    to_objective_number = self.ask_objective('To objective number: ')
+
+                    request = (MoveTasks if command == 'mv' else CopyTasks)(
+                        receiver=self.tasks_manager,
+                        task_numbers=task_numbers,
+                        objective_number=objective_number,
+                        to_objective_number=to_objective_number
+                    )
+                    self.execute(request, self.tasks_page, tasks_caretaker, memento)
+                elif command == 'v':
+                    sort_by = input(' '*3 + 'Sort by (d - due date | t - title | empty - as added): ')
+                    tasks_list = self.tasks_page.body
+                    tasks_list.set_view(
+                        {'d': 'due', 't': 'title'}.get(sort_by),
+                        tasks_list.text,
+                        tasks_list.date_range
+                    )
+                    self.tasks_page.display_page(self.user_data)
+                elif command == 'f':
+                    text = input(' '*3 + 'Title contains (empty - any): ')
+                    first = input(' '*3 + 'Due from (empty - any): ')
+                    last = input(' '*3 + 'Due to (empty - any): ')
+
+                    today = datetime.date.today()
+                    first = parse_date(first, today) if first else None
+                    last = parse_date(last, today) if last else None
+
+                    tasks_list = self.tasks_page.body
+                    tasks_list.set_view(
+                        tasks_list.sort_by,
+                        text,
+                        (first, last) if first or last else None
+                    )
                     self.tasks_page.display_page(self.user_data)
                 elif command == 'u':
                     memento = tasks_caretaker.get_memento()
-                    if memento:
-                        memento.restore()
-                        self.tasks_page.display_page(memento.user_data)
+                    if memento and memento.restore():
+                        self.user_data = memento.user_data
+                        self.user_data_version = self.db.version(user.name)
+                        self.titles.reset(self.user_data)
+                        self.invalidate_orders()
+                        self.tasks_page.display_page(self.user_data)
+
+
+def main():
+    my_app = AppProxy(App())
+    my_app.run()
 
 
-my_app = AppProxy(App())
-my_app.run()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1 @@
+"""Puts the root of the repository on sys.path for the tests."""
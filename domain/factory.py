@@ -1,6 +1,8 @@
 """Defines classes for object creation."""
 
 from domain.models.logic import ProtectedUser, SimpleUser, ObjectivesManager, TasksManager
+from domain.models.logic import CaesarCipher, VigenereCipher, VigenereCipherAdapter
+from domain.models.logic import KeystreamCipher
 
 class UserFactory:
     """Creates an instance of an user."""
@@ -17,10 +19,37 @@ class UserFactory:
 class ManagerFactory:
     """Creates an instance of an user."""
     
-    def create(self, manager, db, user):
-        """Instantiates the manager classes."""
+    def create(self, manager, db, user, user_data=None):
+        """Instantiates the manager classes, with the already loaded user
+        data if there is one."""
 
         if manager == "objectives":
-            return ObjectivesManager(db, user)
+            return ObjectivesManager(db, user, user_data)
         elif manager == "tasks":
-            return TasksManager(db, user)
\ No newline at end of file
+            return TasksManager(db, user, user_data)
+
+
+class StrategyFactory:
+    """Creates the security strategy for a password."""
+
+    def create(self, password, name=None):
+        """Instantiates the strategy with the given name, by default the
+        keystream cipher, which new files are encrypted with."""
+
+        name = name or 'keystream'
+        if name == 'keystream':
+            return KeystreamCipher()
+        elif name == 'vigenere':
+            return VigenereCipherAdapter(VigenereCipher(None))
+        elif name == 'caesar':
+            return CaesarCipher()
+        raise ValueError(f'Unknown cipher: {name}')
+
+    def legacy_name(self, password):
+        """The files written before their header named the cipher were
+        encrypted with the strategy chosen by the length of the password."""
+
+        if password and len(password) < 5:
+            return 'vigenere'
+        else:
+            return 'caesar'
@@ -1,7 +1,10 @@
 """Classes for dealing with UI."""
 
+import datetime
 from abc import ABC, abstractmethod
-from domain.models.logic import SingletonMeta
+from domain.models import metrics
+from domain.models.dates import parse_date
+from domain.models.logic import SingletonMeta, TasksManager
 
 
 class Page:
@@ -12,11 +15,12 @@ class Page:
         self.footer = None
 
     def display_page(self, user_data):
-        self.header.user_data = user_data
-        self.header.display()
-        self.body.user_data = user_data
-        self.body.display_list()
-        self.footer.display_commands()
+        with metrics.timer('render_seconds', page=type(self.body).__name__):
+            self.header.user_data = user_data
+            self.header.display()
+            self.body.user_data = user_data
+            self.body.display_list()
+            self.footer.display_commands()
 
 
 class PageBuilder(ABC):
@@ -160,32 +164,130 @@ class ObjectivesUIList(Lists):
 
 
 class TasksUIList(Lists):
-    """Displays the list of tasks."""
+    """Displays the list of tasks, sorted and filtered by the view."""
+
+    SORT_KEYS = {
+        'due': lambda task, date: (date is None, date or datetime.date.min),
+        'title': lambda task, date: (task['title'].casefold(),),
+    }
 
     def __init__(self, user_data):
         super().__init__(user_data)
         self.width = 49
         self.obj_num = None
+        self.sort_by = None
+        self.text = None
+        self.date_range = None
+        # Objective index -> (tasks list, view, storage indices in display order).
+        self._orders = {}
+
+
+    def set_view(self, sort_by=None, text=None, date_range=None):
+        """Sorts the tasks by 'due' date or 'title' (None keeps the order
+        they were added in), and shows only the ones whose title contains
+        the text and whose due date is in the (first, last) range."""
+
+        if sort_by not in (None, *self.SORT_KEYS):
+            raise ValueError(f'Unknown sort key: {sort_by}')
+        self.sort_by = sort_by
+        self.text = text or None
+        self.date_range = date_range
+
+
+    def invalidate(self, obj_num=None):
+        """Forgets the cached order of the objective, or of every one."""
+        if obj_num is None:
+            self._orders.clear()
+        else:
+            self._orders.pop(int(obj_num) - 1, None)
+
+
+    def order(self):
+        """Returns the storage indices of the shown tasks, in display order.
+
+        The order is cached per objective, and computed again when the
+        tasks list is replaced or its length changes. A change that keeps
+        both (a due date or a title changed in place) needs invalidate(),
+        which the app calls after every change of the user data.
+        """
+
+        index = int(self.obj_num) - 1
+        tasks = self.user_data['objectives'][index]['tasks']
+        view = (self.sort_by, self.text, self.date_range)
+
+        cached = self._orders.get(index)
+        if cached and cached[0] is tasks and cached[1] == view and cached[2] == len(tasks):
+            return cached[3]
+
+        dates = None
+        if self.sort_by == 'due' or self.date_range:
+            today = datetime.date.today()
+            dates = [parse_date(task['due_date'], today) for task in tasks]
+
+        order = range(len(tasks))
+        if self.text:
+            text = self.text.casefold()
+            order = [i for i in order if text in tasks[i]['title'].casefold()]
+        if self.date_range:
+            first, last = self.date_range
+            order = [i for i in order if dates[i] and
+                     (not first or first <= dates[i]) and (not last or dates[i] <= last)]
+        if self.sort_by:
+            key = self.SORT_KEYS[self.sort_by]
+            order = sorted(order, key=lambda i: key(tasks[i], dates and dates[i]))
+        order = list(order)
+
+        self._orders[index] = (tasks, view, len(tasks), order)
+        return order
+
+
+    def to_storage(self, task_numbers):
+        """Maps displayed task numbers ("3" or "1,3,5-7") to the numbers
+        of the tasks in the objective, the ones the managers take."""
+
+        order = self.order()
+        if not (self.sort_by or self.text or self.date_range):
+            return task_numbers
+
+        shown = TasksManager.parse_numbers(task_numbers)
+        return ','.join(str(order[num - 1] + 1) for num in shown if 0 < num <= len(order))
 
 
     def display_list(self):
         """Lists all the tasks that you have in the objective."""
 
         index = int(self.obj_num)-1
+        tasks = self.user_data['objectives'][index]['tasks']
         print('-'*self.width)
         print('Objective: ' + self.user_data['objectives'][index]['title'])
-        print('Tasks: ')
+        print('Tasks: ' + self._describe_view())
         print('-'*self.width)
 
-        if self.user_data['objectives'][index]['tasks']:
+        order = self.order()
+        if order:
             num = 0
-            for task in self.user_data['objectives'][index]['tasks']:
+            for task_index in order:
                 num += 1 
+                task = tasks[task_index]
                 print(str(num) + ' - ' + task['title'] + ' - ' + task['due_date'])
+        elif tasks:
+            print(' '*4 + 'No tasks match the filter.')
         else:
             print(' '*4 + 'No tasks.')
 
 
+    def _describe_view(self):
+        parts = []
+        if self.sort_by:
+            parts.append('by ' + self.sort_by)
+        if self.text:
+            parts.append(f'"{self.text}"')
+        if self.date_range:
+            first, last = self.date_range
+            parts.append(f'{first or "..."} to {last or "..."}')
+        return '(' + ', '.join(parts) + ')' if parts else ''
+
+
 class Commands(ABC):
 
     @abstractmethod
@@ -248,6 +350,22 @@ class TasksUICommandsDecorator:
         """Gives a list of commands to apply on the tasks."""
         self.basic_commands_object.display_commands()
         print('mn - modify name | md - modify date | u - undo')
+        print('v - sort | f - filter')
+        if isinstance(self.basic_commands_object, TasksUIOptionalCommands):
+            self.basic_commands_object.display_optional_task_commands()
+        else:
+            print('-'*self.width)
+
+
+class ObjectivesUICommandsDecorator:
+    def __init__(self, basic_commands_object):
+        self.width = 49
+        self.basic_commands_object = basic_commands_object
+
+    def display_commands(self):
+        """Gives a list of commands to apply on the objectives."""
+        self.basic_commands_object.display_commands()
+        print('s - stats | mem - memory | u - undo')
         print('-'*self.width)
 
 
@@ -261,5 +379,65 @@ class TasksUIOptionalCommands(TasksUIBasicCommands):
         """Gives a list of optional commands to apply on the tasks."""
         
         print('-'*self.width)
-        print('X - delete every task | U - delete one task')
-        print('-'*self.width)
\ No newline at end of file
+        print('X - delete every task | U - delete tasks')
+        print('mv - move tasks | cp - copy tasks')
+        print('-'*self.width)
+
+
+class StatsUI:
+    """Displays the statistics of the tasks."""
+
+    def __init__(self):
+        self.width = 49
+
+    def display(self, report):
+        """Prints the report made by TaskStats."""
+
+        print('-'*self.width)
+        print(f"Tasks: {report['tasks']} | overdue: {report['overdue']} | "
+              f"upcoming: {report['upcoming']} | no date: {report['undated']}")
+        print('-'*self.width)
+        for objective in report['objectives']:
+            print(f"{objective['title']} - {objective['tasks']} tasks, "
+                  f"{objective['overdue']} overdue, {objective['upcoming']} upcoming")
+        print('-'*self.width)
+        for label, count in report['distribution'].items():
+            print(f'{label:<20}{count}')
+        print('-'*self.width)
+        for month, count in report['histogram'].items():
+            print(f'{month}  {count}')
+        print('-'*self.width)
+
+
+class MemoryUI:
+    """Displays the memory report."""
+
+    def __init__(self):
+        self.width = 49
+
+    def display(self, report):
+        """Prints the report made by MemoryReport."""
+
+        kib = lambda size: f'{size / 1024:,.1f} KiB'
+        place = lambda site: '/'.join(site['file'].split('/')[-2:]) + f":{site['line']}"
+
+        print('-'*self.width)
+        for name, size in report['subsystems'].items():
+            print(f"{name:<16}{kib(size['bytes']):>16} {size['objects']:>10} objects")
+        print('-'*self.width)
+        traced = report['traced']
+        print(f"Traced: {kib(traced['current'])} | peak: {kib(traced['peak'])}")
+        if report['max_rss']:
+            print(f"Max RSS: {kib(report['max_rss'])}")
+        if report['tracing_started']:
+            print('Tracing started, the next report shows the growth.')
+        print('-'*self.width)
+        print('Top allocation sites:')
+        for site in report['top']:
+            print(f"{kib(site['bytes']):>14}  {place(site)}")
+        if report['growth']:
+            print('-'*self.width)
+            print('Growth since the last report:')
+            for site in report['growth']:
+                print(f"{'+' if site['bytes'] > 0 else '-'}{kib(abs(site['bytes'])):>13}  {place(site)}")
+        print('-'*self.width)
@@ -0,0 +1,24 @@
+"""
+Due dates: the formats a due date can be written in. Kept apart from the
+stats so that sorting and filtering the tasks by date does not import
+NumPy.
+"""
+
+import datetime
+
+
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y', '%d/%m/%Y', '%d-%m-%Y')
+RELATIVE_DATES = {'yesterday': -1, 'today': 0, 'tomorrow': 1}
+
+
+def parse_date(text, today):
+    """Parses a due date, returns None if it is not a date."""
+    text = text.strip()
+    if text.lower() in RELATIVE_DATES:
+        return today + datetime.timedelta(days=RELATIVE_DATES[text.lower()])
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, date_format).date()
+        except ValueError:
+            pass
+    return None
@@ -0,0 +1,134 @@
+"""
+Memory diagnostics for long sessions: how much the loaded user data, the
+undo history, the caches and the pages hold, where the memory was
+allocated, and how much every allocation site grew since the last report.
+
+The allocation sites come from tracemalloc, which the first report starts
+(or Python at startup, with PYTHONTRACEMALLOC=<frames>), so they only
+cover what was allocated after that.
+"""
+
+import collections
+import sys
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+CONTAINERS = (list, tuple, set, frozenset, collections.deque)
+
+
+def deep_size(roots, seen, boundary=frozenset()):
+    """Returns the size in bytes and the number of the objects reachable
+    from the roots.
+
+    The objects in seen (by id) are not counted again, and the ones in
+    boundary (by id) are not followed, they belong to another subsystem.
+    Only containers and the objects of the domain classes are followed.
+    """
+
+    size = count = 0
+    stack = list(roots)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        count += 1
+
+        if isinstance(obj, dict):
+            children = [*obj.keys(), *obj.values()]
+        elif isinstance(obj, CONTAINERS):
+            children = obj
+        elif type(obj).__module__.startswith('domain.'):
+            children = [vars(obj)] if hasattr(obj, '__dict__') else []
+            children += [getattr(obj, name)
+                         for name in getattr(type(obj), '__slots__', ())
+                         if hasattr(obj, name)]
+        else:
+            continue
+        stack.extend(child for child in children if id(child) not in boundary)
+    return size, count
+
+
+class MemoryReport:
+    """Measures the subsystems and compares tracemalloc snapshots."""
+
+    FILTERS = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        # Leaves out what the report allocates itself.
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    )
+
+    def __init__(self, frames=1, top=10):
+        self.frames = frames
+        self.top = top
+        self._last = None
+
+
+    def report(self, subsystems):
+        """Returns the memory report.
+
+        subsystems maps the names of the subsystems to lists of their root
+        objects. They are measured in order, so an object shared by two of
+        them is counted in the first one.
+        """
+
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(self.frames)
+            self._last = None
+        snapshot = tracemalloc.take_snapshot().filter_traces(self.FILTERS)
+        current, peak = tracemalloc.get_traced_memory()
+
+        growth = []
+        if self._last is not None:
+            growth = [self._site(stat, stat.size_diff, stat.count_diff)
+                      for stat in snapshot.compare_to(self._last, 'lineno')[:self.top]
+                      if stat.size_diff]
+        self._last = snapshot
+
+        # Measured after the snapshot, which then leaves out the ids seen.
+        boundary = {id(root) for roots in subsystems.values() for root in roots}
+        seen = set()
+        sizes = {}
+        for name, roots in subsystems.items():
+            size, count = deep_size(roots, seen, boundary)
+            sizes[name] = {'bytes': size, 'objects': count}
+
+        return {
+            'subsystems': sizes,
+            'tracing_started': started,
+            'traced': {'current': current, 'peak': peak},
+            'max_rss': self._max_rss(),
+            'top': [self._site(stat, stat.size, stat.count)
+                    for stat in snapshot.statistics('lineno')[:self.top]],
+            'growth': growth,
+        }
+
+
+    def stop(self):
+        """Stops tracing and forgets the last snapshot."""
+        tracemalloc.stop()
+        self._last = None
+
+
+    def _max_rss(self):
+        if resource is None:
+            return None
+        # In kilobytes, except on macOS.
+        unit = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+
+
+    def _site(self, stat, size, count):
+        frame = stat.traceback[0]
+        return {'file': frame.filename, 'line': frame.lineno,
+                'bytes': size, 'blocks': count}
@@ -0,0 +1,121 @@
+"""
+Aggregate reporting over every user in the DB directory. The user files
+are split into chunks that are loaded and evaluated by a process pool,
+and the partial reports of the chunks are merged into one.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from domain.models.stats import BUCKET_LABELS, TaskColumns, TaskStats
+
+
+def empty_report():
+    """The report of no users, the identity of merge_reports."""
+    return {
+        'users': 0,
+        'unreadable': [],
+        'tasks': 0,
+        'overdue': 0,
+        'upcoming': 0,
+        'undated': 0,
+        'distribution': dict.fromkeys(BUCKET_LABELS, 0),
+        'histogram': {},
+    }
+
+
+def merge_reports(total, part):
+    """Adds the partial report to the total one."""
+    for key in ('users', 'unreadable', 'tasks', 'overdue', 'upcoming', 'undated'):
+        total[key] += part[key]
+    for label, count in part['distribution'].items():
+        total['distribution'][label] += count
+    for month, count in part['histogram'].items():
+        total['histogram'][month] = total['histogram'].get(month, 0) + count
+    return total
+
+
+def report_chunk(directory, users, today):
+    """Loads and evaluates a chunk of users, runs in a worker process.
+
+    users is a list of (user name, password) pairs.
+    """
+
+    from domain.factory import UserFactory, StrategyFactory
+    from domain.models.logic import DB, SecurityContext
+
+    db = DB(SecurityContext(None))
+    db.directory = directory
+    user_factory, strategy_factory = UserFactory(), StrategyFactory()
+
+    users_data, unreadable = [], []
+    for user_name, password in users:
+        db.password_manager = SecurityContext(strategy_factory.create(password))
+        user_data = db.get_user_data(user_factory.create_user(user_name, password))
+        if user_data:
+            users_data.append(user_data)
+        else:
+            unreadable.append(user_name)
+
+    report = TaskStats(TaskColumns.from_user_data(users_data, today), today).report()
+    del report['objectives'], report['today']
+    report['users'] = len(users_data)
+    report['unreadable'] = unreadable
+    return report
+
+
+def fleet_report(directory='DB', credentials=None, workers=None, chunk_size=64,
+                 today=None):
+    """Reports on every user file of the directory using a process pool.
+
+    credentials maps the user names to their passwords, the users that
+    are not in it are read as unprotected users.
+    """
+
+    credentials = credentials or {}
+    today = today or datetime.date.today()
+    users = [(file_name[:-len('.txt')], credentials.get(file_name[:-len('.txt')]))
+             for file_name in sorted(os.listdir(directory))
+             if file_name.endswith('.txt')]
+    chunks = [users[start:start + chunk_size]
+              for start in range(0, len(users), chunk_size)]
+
+    total = empty_report()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        parts = executor.map(
+            report_chunk,
+            [directory] * len(chunks), chunks, [today] * len(chunks))
+        for part in parts:
+            merge_reports(total, part)
+
+    total['today'] = str(today)
+    total['histogram'] = dict(sorted(total['histogram'].items()))
+    return total
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m domain.models.fleet',
+        description='Aggregate report over every user in the DB directory.')
+    parser.add_argument('--directory', default='DB')
+    parser.add_argument('--credentials',
+                        help='JSON file that maps user names to passwords')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=64)
+    args = parser.parse_args(argv)
+
+    credentials = None
+    if args.credentials:
+        with open(args.credentials) as file:
+            credentials = json.load(file)
+
+    report = fleet_report(args.directory, credentials, args.workers, args.chunk_size)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
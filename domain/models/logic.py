@@ -3,8 +3,26 @@ Containts the classes that represent the core concepts of the
 task management system.
 """
 
+import atexit
+import base64
+import collections
+import contextlib
+import copy
+import hashlib
+import hmac
+import io
+import mmap
+import os
+import threading
 from abc import ABC, ABCMeta, abstractmethod
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from domain.models import metrics
+
 
 class SingletonMeta(type):
     """
@@ -27,69 +45,1131 @@ class DataSource(metaclass=CustomMeta):
     def get_user_data(self):
         pass
 
+    @classmethod
+    def new(cls, *args, **kwargs):
+        """Builds a store of its own instead of returning the one shared
+        by the program, for the tools and tests that need several."""
+        return type.__call__(cls, *args, **kwargs)
+
+
+class RecordIndex:
+    """What a DB knows about the records in a user's file: the plain text
+    of every record and where it is, the size, the stat signature and the
+    header line of the file, and the key and the salt it was encrypted with.
+
+    A load only lists the texts with their spans, the map from the texts
+    to the spans is built when a save or a reload first needs it.
+    """
+
+    def __init__(self, key, signature, size, header=b'', salt=None):
+        self.key = key
+        self.signature = signature
+        self.size = size
+        self.header = header
+        self.salt = salt
+        self.loaded = []
+        self._spans = None
+
+    @property
+    def spans(self):
+        """The span of every record, by its plain text."""
+        if self._spans is None:
+            self._spans = dict(self.loaded)
+            self.loaded = []
+        return self._spans
+
+    @spans.setter
+    def spans(self, spans):
+        self._spans = spans
+        self.loaded = []
+
 
 class DB(DataSource):
-    """Deals with the user data."""
+    """Deals with the user data.
+
+    The files are written in a record format: a header line, then every
+    record encrypted on its own (one for the user, one per objective and
+    one per task), then a table with the byte offsets of the records and
+    a fixed width trailer that points to the table. The file is memory
+    mapped on read, so every record is decrypted and parsed straight from
+    its slice of the map, and only the records that are asked for.
+
+    The header line holds a random salt and a nonce. scrypt derives the
+    secret of the file from the salt, the password and the user name, and
+    the header keeps a MAC of the nonce made with that secret, so a wrong
+    login is rejected without decrypting anything while every guess of
+    the password costs a scrypt. Ciphers such as the keystream one take
+    their key from the secret too. The header also names the cipher the
+    records are encrypted with: a file is always read with its own cipher
+    and key, and moves to the cipher of the DB the next time it is saved.
+
+    A save encrypts only the records that changed since the file was last
+    read or written. They are appended together with a new table, and
+    the file is rewritten once the stale records outweigh the live ones.
+    The appends hold a lock on a lock file next to the user's file, and
+    the readers map the file under a shared lock, so processes that share
+    the directory never see a half written append. Where there is no
+    fcntl every save rewrites the file instead.
+    Files in the older format, a single encrypted dictionary, are still
+    read.
+    """
+
+    MAGIC = b'TMS1'
+    TRAILER = 21
+    COMPACT_MIN = 1 << 14
+    SCRYPT = {'n': 1 << 14, 'r': 8, 'p': 1}
     
     def __init__(self, cipher):
         self.password_manager = cipher
+        self.directory = 'DB'
+        self._indexes = {}
+        self._written = {}
+        self._ciphers = {}
+        self._secrets = {}
+        self._versions = {}
+        self._lock = threading.RLock()
+
+
+    def path(self, user_name):
+        """Returns the path of the user's file."""
+        return os.path.join(self.directory, f'{user_name}.txt')
+
+
+    def signature(self, user_name):
+        """Returns what changes whenever the user's file is written."""
+        try:
+            return self._stat_signature(os.stat(self.path(user_name)))
+        except FileNotFoundError:
+            return None
+
+
+    def written_signature(self, user_name):
+        """Returns the signature of the user's file after this DB last wrote it."""
+        return self._written.get(user_name)
+
+
+    def user_names(self):
+        """Returns the names of the users that have a file."""
+        return sorted(file_name[:-len('.txt')] for file_name in os.listdir(self.directory)
+                      if file_name.endswith('.txt'))
+
+
+    def version(self, user_name):
+        """Returns the version of the user's data, it goes up with every
+        save through this DB."""
+        return self._versions.get(user_name, 0)
 
 
     def get_user_data(self, user):  
         """Extract the user data from the .txt file as a dictionary."""  
+        metrics.count('db_calls_total', op='load')
+        phases = metrics.phases('db_load_phase_seconds')
         try:
-            with open(f'DB/{user.name}.txt', 'r') as file:
-                file_data = file.read()
-                if user.password is None:
-                    if user.name in file_data:
-                        try:
-                            return eval(file_data)
-                        except Exception:
-                            return None
-                    else:
-                        return None
-                else:
-                    file_data = self.password_manager.decrypt(
-                        encrypted_message=file_data,
-                        key1=len(user.password),
-                        key2=user.password)
-                    if user.name in file_data:
-                        try:
-                            return eval(file_data)
-                        except Exception:
-                            return None
-                    else:
+            return self._load_user_data(user, phases)
+        finally:
+            phases.observe()
+
+
+    def reload_user_data(self, user, user_data):
+        """Loads the user data again after the file was changed by someone
+        else. The records that are still the same as in user_data are
+        taken from it instead of being decrypted again."""
+
+        metrics.count('db_calls_total', op='reload')
+        index = self._indexes.get(user.name)
+        previous = None
+        if index and user_data and index.key[0] == user.password:
+            previous = index, user_data
+
+        phases = metrics.phases('db_load_phase_seconds')
+        try:
+            return self._load_user_data(user, phases, previous)
+        finally:
+            phases.observe()
+
+
+    def _records(self, user_data):
+        """Yields the records of the user data as they are stored: the user
+        without the objectives, the objectives without the tasks, the tasks."""
+        yield {key: value for key, value in user_data.items() if key != 'objectives'}
+        for objective in user_data['objectives']:
+            yield {key: value for key, value in objective.items() if key != 'tasks'}
+            yield from objective['tasks']
+
+
+    def _reuse(self, buffer, index, user_data):
+        """Returns the records of user_data that are still in the file, by
+        their span. The file was only appended to since the index was made
+        if it starts with the same header line, whose salt is new at every
+        rewrite, and is not shorter; otherwise nothing is reused."""
+        if len(buffer) < index.size or buffer[:len(index.header)] != index.header:
+            return None
+        records = {str(record): record for record in self._records(user_data)}
+        return {span: (text, records[text])
+                for text, span in index.spans.items() if text in records}
+
+
+    def _load_user_data(self, user, phases, previous=None):
+        try:
+            with self._open(user.name) as (buffer, signature):
+                if buffer is None:
+                    return None
+                metrics.count('db_bytes_total', len(buffer), op='load')
+                if buffer[:len(self.MAGIC)] != self.MAGIC:
+                    return self._load_legacy(buffer, user, phases)
+
+                with phases('read'):
+                    if not self._verify(buffer, user):
                         return None
+                    head, entries = self._read_table(buffer)
+                    cipher = self._cipher(buffer, user)
+                    reuse = self._reuse(buffer, *previous) if previous else None
+                index = RecordIndex(self._key(user, cipher), signature, len(buffer),
+                                    buffer[:buffer.find(b'\n') + 1], self._salt(buffer))
+                user_data = self._load_records(
+                    buffer, [head], user, phases, index, reuse, cipher)[0]
+                if not user_data or user_data.get('user_name') != user.name:
+                    return None
+                user_data['objectives'] = [
+                    self._load_objective(buffer, entry, user, phases, index, reuse, cipher)
+                    for entry in entries]
+                with self._lock:
+                    self._indexes[user.name] = index
+                return user_data
         except FileNotFoundError:
             return {'user_name': user.name, 'objectives': []}
+        except (ValueError, IndexError):
+            # A truncated or torn file: its table or header cannot be read.
+            return None
+
+
+    def get_objective(self, user, obj_num):
+        """Reads a single objective without loading the whole file."""
+        metrics.count('db_calls_total', op='load_objective')
+        index_obj = int(obj_num) - 1
+        return self._load_entry(
+            user, index_obj,
+            lambda buffer, entry, cipher: self._load_objective(
+                buffer, entry, user, cipher=cipher),
+            lambda user_data: user_data['objectives'][index_obj])
+
+
+    def get_task(self, user, obj_num, task_num):
+        """Reads a single task, decrypting only its record."""
+        metrics.count('db_calls_total', op='load_task')
+        index_obj = int(obj_num) - 1
+        index_tsk = int(task_num) - 1
+
+        return self._load_entry(
+            user, index_obj,
+            lambda buffer, entry, cipher: self._load_record(
+                buffer, entry[1][index_tsk], user, cipher=cipher),
+            lambda user_data: user_data['objectives'][index_obj]['tasks'][index_tsk])
+
+
+    def _load_entry(self, user, index_obj, load, pick):
+        """Calls load with the buffer, the table entry of the objective and
+        the cipher of the file, or pick with the whole user data for a file
+        in the single-dictionary format."""
+        try:
+            with self._open(user.name) as (buffer, signature):
+                if buffer is None:
+                    return None
+                if buffer[:len(self.MAGIC)] != self.MAGIC:
+                    user_data = self._load_legacy(buffer, user)
+                    return pick(user_data) if user_data else None
+
+                if not self._verify(buffer, user):
+                    return None
+                head, entries = self._read_table(buffer)
+                cipher = self._cipher(buffer, user)
+                user_data = self._load_record(buffer, head, user, cipher=cipher)
+                if not user_data or user_data.get('user_name') != user.name:
+                    return None
+                return load(buffer, entries[index_obj], cipher)
+        except (FileNotFoundError, ValueError, IndexError):
+            return None
         
 
     def save_user_data(self, user, user_data):
         """Save the user data in the .txt file."""
 
-        with open(f'DB/{user_data["user_name"]}.txt', 'w') as file:
-            if user.password:
-                encrypted_user_data = self.password_manager.encrypt(
-                    message=str(user_data), 
-                    key1=len(user.password), 
-                    key2=user.password)
-                file.write(encrypted_user_data)
+        metrics.count('db_calls_total', op='save')
+        phases = metrics.phases('db_save_phase_seconds')
+        user_name = user_data['user_name']
+        with self._lock, self._locked(user_name):
+            self._save_user_data(user, user_data, phases)
+            self._versions[user_name] = self._versions.get(user_name, 0) + 1
+        phases.observe()
+
+
+    def _save_user_data(self, user, user_data, phases):
+        user_name = user_data['user_name']
+        index = self._indexes.pop(user_name, None)
+        if index and (index.key != self._key(user)
+                      or index.signature != self.signature(user_name)):
+            index = None
+        spans = index.spans if index else {}
+        # The salt stays as long as records encrypted with it are kept.
+        salt = index.salt if index else os.urandom(16)
+        cipher = self._context(self._cipher_name(self.password_manager), user, salt)
+
+        # Every record is identified by its plain text, and only the
+        # records that are not in the file yet get encrypted.
+        encrypted, order = {}, {}
+        def place(record):
+            with phases('serialize'):
+                text = str(record)
+            if text not in spans and text not in encrypted:
+                with phases('encrypt'):
+                    encrypted[text] = self._encode(text, user, cipher)
+            order[text] = None
+            return text
+
+        head = place({key: value for key, value in user_data.items() if key != 'objectives'})
+        table = [(place({key: value for key, value in objective.items() if key != 'tasks'}),
+                  [place(task) for task in objective['tasks']])
+                 for objective in user_data['objectives']]
+
+        with phases('write'):
+            index, size = self._write(user, user_name, index, salt, encrypted, order, head, table)
+        metrics.count('db_bytes_total', size, op='save')
+
+        index.spans = {text: index.spans[text] for text in order}
+        index.key = self._key(user)
+        index.signature = self.signature(user_name)
+        self._indexes[user_name] = index
+        self._written[user_name] = index.signature
+
+
+    def _write(self, user, user_name, index, salt, encrypted, order, head, table):
+        """Writes the records to the file, returns the new index and the
+        number of bytes written."""
+
+        live = sum(index.spans[text][1] - index.spans[text][0]
+                   if index and text in index.spans
+                   else len(encrypted[text]) for text in order)
+        appended = sum(len(record) for record in encrypted.values())
+        if fcntl and index and index.size + appended - live <= max(live, self.COMPACT_MIN):
+            return index, self._append(user_name, index, encrypted, head, table)
+        index = self._rewrite(user, user_name, index, salt, encrypted, order, head, table)
+        return index, index.size
+
+
+    def _append(self, user_name, index, encrypted, head, table):
+        """Appends the new records and a new table to the file, returns the
+        number of bytes written."""
+
+        chunks, offset = [], index.size
+        for text, record in encrypted.items():
+            index.spans[text] = (offset, offset + len(record))
+            offset += len(record)
+            chunks.append(record)
+        chunks.append(self._table(index.spans, head, table))
+        chunks.append(f'{offset:0{self.TRAILER - 1}d}\n'.encode())
+
+        data = b''.join(chunks)
+        with open(self.path(user_name), 'r+b') as file:
+            file.seek(index.size)
+            file.write(data)
+        index.size += len(data)
+        return len(data)
+
+
+    def _rewrite(self, user, user_name, index, salt, encrypted, order, head, table):
+        """Writes a new file with the live records only, the ones that did
+        not change are copied from the old file without re-encrypting them."""
+
+        # Write to a temporary file and swap it in, so that a reader that
+        # has the old file mapped never sees it being truncated.
+        path = self.path(user_name)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with contextlib.ExitStack() as stack:
+            old_buffer = (stack.enter_context(self._open(user_name, shared=False))[0]
+                          if index else None)
+            with open(tmp_path, 'wb') as file:
+                index = self._write_records(
+                    file, user, user_name, index, salt, old_buffer, encrypted, order, head, table)
+        os.replace(tmp_path, path)
+        return index
+
+
+    def _write_records(self, file, user, user_name, index, salt, old_buffer, encrypted,
+                       order, head, table):
+        """Writes the header, the records, the table and the trailer to the
+        file, taking the records that are not in encrypted from old_buffer.
+        Returns the index of the written records."""
+
+        # A new nonce at every rewrite tells the rewritten file from the old one.
+        nonce = os.urandom(16)
+        verifier = self._verifier(nonce, user_name, user.password, salt)
+        header = f' v={nonce.hex()}${verifier} k={salt.hex()}'
+        if user.password:
+            header += f' c={self._cipher_name(self.password_manager)}'
+        header = self.MAGIC + f'{header}\n'.encode()
+        offset = file.write(header)
+        spans = {}
+        for text in order:
+            if text in encrypted:
+                record = encrypted[text]
             else:
-                file.write(str(user_data))
+                start, end = index.spans[text]
+                record = old_buffer[start:end]
+            spans[text] = (offset, offset + len(record))
+            offset += file.write(record)
+        size = offset + file.write(self._table(spans, head, table))
+        size += file.write(f'{offset:0{self.TRAILER - 1}d}\n'.encode())
+
+        index = RecordIndex(None, None, size, header, salt)
+        index.spans = spans
+        return index
+
+
+    def _table(self, spans, head, table):
+        """One line with the span of the user record, then a line per
+        objective with the span of the objective and of its tasks."""
+        lines = ['%d %d' % spans[head]]
+        for objective, tasks in table:
+            line = ['%d %d' % spans[objective]]
+            line += ['%d %d' % spans[task] for task in tasks]
+            lines.append(' '.join(line))
+        return ('\n'.join(lines) + '\n').encode()
+
+
+    def _read_table(self, buffer):
+        """Returns the span of the user record, and an entry for every
+        objective: its span and the spans of its tasks."""
+        table_offset = int(buffer[-self.TRAILER:])
+        table = buffer[table_offset:-self.TRAILER].decode()
+        lines = table.splitlines()
+        head = tuple(map(int, lines[0].split()))
+        entries = []
+        for line in lines[1:]:
+            numbers = list(map(int, line.split()))
+            entries.append(((numbers[0], numbers[1]),
+                            list(zip(numbers[2::2], numbers[3::2]))))
+        return head, entries
+
+
+    @contextlib.contextmanager
+    def _open(self, user_name, shared=True):
+        """Yields the user's file mapped into memory (None if it is empty)
+        and its signature. Raises FileNotFoundError if there is no file.
+
+        The file is mapped under a shared lock, unless the caller already
+        holds the lock of the user. An append never changes the bytes
+        that are already mapped.
+        """
+        with open(self.path(user_name), 'rb') as file:
+            with self._locked(user_name, exclusive=False) if shared else contextlib.nullcontext():
+                signature = self._stat_signature(os.fstat(file.fileno()))
+                buffer = self._map(file)
+            if buffer is None:
+                yield None, signature
+            else:
+                with buffer:
+                    yield buffer, signature
+
+
+    @contextlib.contextmanager
+    def _locked(self, user_name, exclusive=True):
+        """Holds the lock of the user's file, an exclusive one by default."""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, f'{user_name}.lock'), 'ab') as file:
+            fcntl.flock(file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+
+    def _map(self, file):
+        """Maps the opened file into memory, None for an empty file."""
+        if os.fstat(file.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+    def _stat_signature(self, stat):
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+    def _key(self, user, cipher=None):
+        """What the records of the user are encrypted with, by default what
+        they are saved with."""
+        if not user.password:
+            return None, None
+        return user.password, self._cipher_name(cipher or self.password_manager)
+
+
+    def _cipher_name(self, cipher):
+        strategy = cipher.strategy
+        return getattr(strategy, 'name', type(strategy).__name__)
+
+
+    def _cipher(self, buffer, user):
+        """Returns the security context the file was encrypted with: the
+        one of the cipher named in its header or, for the files written
+        before the header named it, of the cipher the password chose."""
+
+        from domain.factory import StrategyFactory
+
+        if not user.password:
+            return self.password_manager
+        name = (self._header(buffer).get('c')
+                or StrategyFactory().legacy_name(user.password))
+        return self._context(name, user, self._salt(buffer))
+
+
+    def _context(self, name, user, salt):
+        """Returns the security context of the named cipher with the key
+        it derives for the user's file with the salt."""
+
+        from domain.factory import StrategyFactory
+
+        if not user.password:
+            return self.password_manager
+        key = (name, user.name, user.password, salt)
+        with self._lock:
+            if key not in self._ciphers:
+                if name == self._cipher_name(self.password_manager):
+                    strategy = self.password_manager.strategy
+                else:
+                    strategy = StrategyFactory().create(user.password, name)
+                secret = self._secret(salt, user.name, user.password) if salt else None
+                self._ciphers[key] = SecurityContext(
+                    strategy, strategy.derive_key(user.password, secret))
+            return self._ciphers[key]
+
+
+    def _salt(self, buffer):
+        """Returns the salt of the file, None for a file in the
+        single-dictionary format."""
+        salt = self._header(buffer).get('k')
+        return bytes.fromhex(salt) if salt is not None else None
+
+
+    def _secret(self, salt, user_name, password):
+        """Derives the secret of a file from the password and the user name
+        with scrypt, so that every guess of the password is slow."""
+        key = (salt, user_name, password)
+        if key not in self._secrets:
+            data = f'{password or ""}\0{user_name}'.encode()
+            if password:
+                secret = hashlib.scrypt(data, salt=salt, dklen=32, **self.SCRYPT)
+            else:
+                # Without a password there is nothing to guess.
+                secret = hashlib.blake2b(data, key=salt, digest_size=32).digest()
+            self._secrets[key] = secret
+        return self._secrets[key]
+
+
+    def _header(self, buffer):
+        """Returns the fields of the header line, none for the single-dictionary format."""
+        if buffer[:len(self.MAGIC)] != self.MAGIC:
+            return {}
+        line = buffer[:buffer.find(b'\n')].decode().split()
+        return dict(field.split('=', 1) for field in line[1:] if '=' in field)
+
+
+    def _verifier(self, nonce, user_name, password, salt):
+        """Returns the MAC of the nonce made with the secret of the file."""
+        return hmac.new(self._secret(salt, user_name, password), nonce, 'sha256').hexdigest()
+
+
+    def _verify(self, buffer, user):
+        """Checks the user against the verifier in the header line, False
+        if the verifier or the salt cannot be read."""
+        try:
+            nonce, verifier = self._header(buffer)['v'].split('$')
+            nonce = bytes.fromhex(nonce)
+            salt = self._salt(buffer)
+        except (KeyError, ValueError):
+            return False
+        if salt is None:
+            return False
+        expected = self._verifier(nonce, user.name, user.password, salt)
+        return hmac.compare_digest(verifier.encode(), expected.encode())
+
+
+    def _load_objective(self, buffer, entry, user, phases=metrics.NULL_TIMER,
+                        index=None, reuse=None, cipher=None):
+        """Loads the objective and its tasks from their table entry."""
+        objective, *tasks = self._load_records(
+            buffer, [entry[0], *entry[1]], user, phases, index, reuse, cipher)
+        if objective is not None:
+            objective['tasks'] = tasks
+        return objective
+
+
+    def _load_record(self, buffer, span, user, phases=metrics.NULL_TIMER, cipher=None):
+        """Decrypts and parses one record from its slice of the buffer."""
+        return self._load_records(buffer, [span], user, phases, cipher=cipher)[0]
+
+
+    def _load_records(self, buffer, spans, user, phases=metrics.NULL_TIMER,
+                      index=None, reuse=None, cipher=None):
+        """Decrypts and parses the records from their slices of the buffer,
+        and adds them to the index if one is given. A record whose span is
+        in reuse is copied from it instead. A record that cannot be
+        decrypted or parsed is None."""
+
+        records, texts = [], {}
+        for span in spans:
+            span = tuple(span)
+            if reuse and span in reuse:
+                text, record = reuse[span]
+                records.append(copy.copy(record))
+                if index is not None:
+                    index.loaded.append((text, span))
+                continue
+            try:
+                with phases('decrypt'):
+                    texts[len(records)] = self._decode(buffer[span[0]:span[1]], user, cipher)
+            except ValueError:
+                pass
+            records.append(None)
+
+        with phases('parse'):
+            parsed = self._parse(list(texts.values()))
+        for (position, text), record in zip(texts.items(), parsed):
+            records[position] = record
+            if index is not None and record is not None:
+                index.loaded.append((text, tuple(spans[position])))
+        return records
+
+
+    def _parse(self, texts):
+        """Parses the texts with a single eval, which is much cheaper than
+        one per text, or one by one if some of them are not records."""
+        try:
+            records = eval('[' + ','.join(texts) + ']')
+            if len(records) == len(texts) and all(type(record) is dict for record in records):
+                return records
+        except Exception:
+            pass
+
+        records = []
+        for text in texts:
+            try:
+                record = eval(text)
+            except Exception:
+                record = None
+            records.append(record if type(record) is dict else None)
+        return records
+
+
+    def _load_legacy(self, buffer, user, phases=metrics.NULL_TIMER):
+        """Reads a file that stores the user data as a single dictionary."""
+        with phases('read'):
+            raw = buffer[:]
+        with phases('decrypt'):
+            file_data = self._decode(raw, user, self._cipher(buffer, user))
+        if user.name in file_data:
+            try:
+                with phases('parse'):
+                    return eval(file_data)
+            except Exception:
+                return None
+        else:
+            return None
+
+
+    def _encode(self, text, user, cipher):
+        """Encrypts the text with the cipher if the user has a password."""
+        if user.password:
+            text = cipher.encrypt(
+                message=text, 
+                key1=len(user.password), 
+                key2=user.password)
+        return text.encode()
+
+
+    def _decode(self, raw, user, cipher=None):
+        """Decrypts the raw bytes if the user has a password, by default
+        with the cipher of the DB."""
+        text = raw.decode()
+        if user.password is None:
+            return text
+        try:
+            return (cipher or self.password_manager).decrypt(
+                encrypted_message=text,
+                key1=len(user.password),
+                key2=user.password)
+        except Exception:
+            return ''
+
+
+class PackedDB(DB):
+    """Keeps many users in a few segment files instead of a file per user.
+
+    A save appends a frame (the user name and the user's data in the
+    record format of DB) to the active segment. The location of the last
+    frame of every user is kept in an index in memory, which is built at
+    startup by skipping from one frame header to the next, so a read is a
+    single seek. The stale frames are dropped by a compaction in a
+    background thread that copies the live frames into a new segment.
+    The store is meant to be used by one process at a time.
+
+    Like every DataSource it is shared by the program, so a second
+    PackedDB(cipher, directory) returns the first store with its own
+    directory. open(directory) moves the store to another directory, and
+    PackedDB.new(cipher, directory) builds a separate one.
+    """
+
+    SEGMENT_SIZE = 64 << 20
+    COMPACT_MIN = 1 << 20
+    COMPACT_RATIO = 0.5
+
+    def __init__(self, cipher, directory=os.path.join('DB', 'packed')):
+        super().__init__(cipher)
+        self._readers = {}
+        self._writer = None
+        self._compacting = None
+        self.open(directory)
+
+
+    def open(self, directory):
+        """Builds the index of the segments in the directory."""
+        with self._lock:
+            self.close()
+            self.directory = directory
+            os.makedirs(directory, exist_ok=True)
+            self._locations = {}
+            self._indexes.clear()
+            self._written.clear()
+            segments = self._segments()
+            for number in segments:
+                self._scan(number)
+            self._active = segments[-1] if segments else 1
+            self._count_sizes()
+
+
+    def close(self):
+        """Closes the open segment files."""
+        with self._lock:
+            for file in self._readers.values():
+                file.close()
+            self._readers.clear()
+            if self._writer:
+                self._writer.close()
+                self._writer = None
+
+
+    def path(self, user_name):
+        """The users have no file of their own, this is their segment."""
+        location = self._locations.get(user_name)
+        return self._segment_path(location[0] if location else self._active)
+
+
+    def signature(self, user_name):
+        """Returns the location of the user's last frame."""
+        return self._locations.get(user_name)
+
+
+    def user_names(self):
+        return sorted(self._locations)
+
+
+    def export_files(self, directory):
+        """Writes every user to a file of its own, in the layout of DB."""
+        os.makedirs(directory, exist_ok=True)
+        for user_name in self.user_names():
+            with self._open(user_name) as (buffer, signature):
+                path = os.path.join(directory, f'{user_name}.txt')
+                with open(f'{path}.tmp', 'wb') as file:
+                    file.write(buffer or b'')
+                os.replace(f'{path}.tmp', path)
+
+
+    def import_files(self, directory):
+        """Packs every user file of a directory in the layout of DB."""
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.endswith('.txt'):
+                with open(os.path.join(directory, file_name), 'rb') as file:
+                    self._append_frame(file_name[:-len('.txt')], file.read())
+        self._maybe_compact()
+
+
+    def compact(self, wait=False):
+        """Copies the live frames into a new segment and deletes the old
+        segments, in a background thread."""
+        with self._lock:
+            thread = self._compacting
+            if thread is None:
+                sealed = self._segments()
+                if not sealed:
+                    return
+                # Saves go to a new segment after the compacted one, so
+                # that a scan of the segments in order still finds the
+                # last frame of every user last.
+                target = sealed[-1] + 1
+                self._active = sealed[-1] + 2
+                if self._writer:
+                    self._writer.close()
+                    self._writer = None
+                thread = threading.Thread(
+                    target=self._compact, args=(sealed, target), daemon=True)
+                self._compacting = thread
+                thread.start()
+        if wait:
+            thread.join()
+
+
+    def _compact(self, sealed, target):
+        with self._lock:
+            frames = {user_name: location for user_name, location in self._locations.items()
+                      if location[0] in sealed}
+
+        moved, offset = {}, 0
+        path = self._segment_path(target)
+        with open(f'{path}.tmp', 'wb') as file:
+            for user_name, location in frames.items():
+                number, frame, start, length = location
+                with self._lock:
+                    reader = self._reader(number)
+                    reader.seek(frame)
+                    data = reader.read(start + length - frame)
+                file.write(data)
+                moved[user_name] = (location, (target, offset, offset + start - frame, length))
+                offset += len(data)
+        os.replace(f'{path}.tmp', path)
+
+        with self._lock:
+            for user_name, (old, new) in moved.items():
+                # A user saved during the compaction keeps the newer frame.
+                if self._locations.get(user_name) == old:
+                    self._locations[user_name] = new
+                    # The data did not change, only where it is.
+                    if user_name in self._indexes and self._indexes[user_name].signature == old:
+                        self._indexes[user_name].signature = new
+                    if self._written.get(user_name) == old:
+                        self._written[user_name] = new
+            for number in sealed:
+                reader = self._readers.pop(number, None)
+                if reader:
+                    reader.close()
+                os.remove(self._segment_path(number))
+            self._count_sizes()
+            self._compacting = None
+
+
+    @contextlib.contextmanager
+    def _open(self, user_name, shared=True):
+        """Yields the user's data read with a single seek (None if it is
+        empty) and its location."""
+        with self._lock:
+            location = self._locations.get(user_name)
+            if location is None:
+                raise FileNotFoundError(user_name)
+            number, frame, start, length = location
+            reader = self._reader(number)
+            reader.seek(start)
+            buffer = reader.read(length)
+        yield buffer or None, location
+
+
+    @contextlib.contextmanager
+    def _locked(self, user_name, exclusive=True):
+        # The store is used by one process, the frames are never changed.
+        yield
+
+
+    def _write(self, user, user_name, index, salt, encrypted, order, head, table):
+        """Writes the user's data in a new frame, the records that did not
+        change are copied from the previous frame."""
+        file = io.BytesIO()
+        with contextlib.ExitStack() as stack:
+            old_buffer = stack.enter_context(self._open(user_name))[0] if index else None
+            index = self._write_records(
+                file, user, user_name, index, salt, old_buffer, encrypted, order, head, table)
+        size = self._append_frame(user_name, file.getvalue())
+        self._maybe_compact()
+        return index, size
+
+
+    def _append_frame(self, user_name, data):
+        """Appends a frame to the active segment, returns its size."""
+        name = user_name.encode()
+        header = b'%d %d\n' % (len(name), len(data))
+        with self._lock:
+            if self._writer is None:
+                self._writer = open(self._segment_path(self._active), 'ab')
+            frame = self._writer.seek(0, os.SEEK_END)
+            self._writer.write(header + name + data)
+            self._writer.flush()
+            self._add(user_name, (self._active, frame, frame + len(header) + len(name), len(data)))
+
+            if frame + len(header) + len(name) + len(data) >= self.SEGMENT_SIZE:
+                self._writer.close()
+                self._writer = None
+                self._active += 1
+        return len(header) + len(name) + len(data)
+
+
+    def _add(self, user_name, location):
+        old = self._locations.get(user_name)
+        if old:
+            self._live -= old[2] + old[3] - old[1]
+        self._live += location[2] + location[3] - location[1]
+        self._total += location[2] + location[3] - location[1]
+        self._locations[user_name] = location
+
+
+    def _count_sizes(self):
+        self._total = sum(os.path.getsize(self._segment_path(number))
+                          for number in self._segments())
+        self._live = sum(start + length - frame
+                         for number, frame, start, length in self._locations.values())
+
+
+    def _maybe_compact(self):
+        if self._total > self.COMPACT_MIN \
+                and self._total - self._live > self._total * self.COMPACT_RATIO:
+            self.compact()
+
+
+    def _scan(self, number):
+        """Adds the frames of the segment to the index."""
+        path = self._segment_path(number)
+        size = os.path.getsize(path)
+        with open(path, 'rb') as file:
+            frame = 0
+            while True:
+                header = file.readline()
+                try:
+                    name_length, length = map(int, header.split())
+                except ValueError:
+                    # The end, or a frame cut by a crash.
+                    break
+                name = file.read(name_length)
+                start = frame + len(header) + name_length
+                if len(name) < name_length or start + length > size:
+                    break
+                self._locations[name.decode()] = (number, frame, start, length)
+                frame = file.seek(start + length)
+
+
+    def _segments(self):
+        return sorted(int(file_name[len('segment-'):-len('.tms')])
+                      for file_name in os.listdir(self.directory)
+                      if file_name.startswith('segment-') and file_name.endswith('.tms'))
+
+
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f'segment-{number:06d}.tms')
+
+
+    def _reader(self, number):
+        if number not in self._readers:
+            self._readers[number] = open(self._segment_path(number), 'rb')
+        return self._readers[number]
+
+
+class AsyncDB:
+    """Proxy that moves the file I/O of a DB to a background thread.
+
+    Saves are written behind: they are queued, and consecutive saves of
+    the same user are coalesced so that only the latest data is written.
+    Reads can be prefetched, and the data of a save is kept once it is
+    written, for the next read. A read always sees the saves that are still
+    pending, and everything pending is flushed when the program exits.
+    A save that fails is dropped, and its error is raised by the next
+    read, save or flush.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.error = None
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._queue = collections.deque()
+        self._queued = set()
+        self._pending = {}
+        self._prefetched = {}
+        self._versions = {}
+        self._busy = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    @property
+    def password_manager(self):
+        return self.db.password_manager
+
+    @password_manager.setter
+    def password_manager(self, cipher):
+        # The pending saves must be encrypted with the old strategy.
+        self.flush()
+        self.db.password_manager = cipher
+
+
+    def get_user_data(self, user):
+        """Returns the pending or prefetched data, or reads the file."""
+        self._raise_error()
+        with self._cond:
+            entry = self._pending.get(user.name)
+            if entry and entry[0].password == user.password:
+                return copy.deepcopy(entry[1])
+            prefetched = self._prefetched.pop(user.name, None)
+
+        if entry:
+            self.flush()
+        elif prefetched and prefetched[0].password == user.password \
+                and prefetched[1] == self.db.signature(user.name):
+            return prefetched[2]
+
+        with self._io_lock:
+            return self.db.get_user_data(user)
+
+
+    def reload_user_data(self, user, user_data):
+        """Reloads the file changed by someone else, see DB.reload_user_data."""
+        if user.name in self._pending:
+            self.flush()
+        with self._io_lock:
+            return self.db.reload_user_data(user, user_data)
+
+
+    def signature(self, user_name):
+        return self.db.signature(user_name)
+
+
+    def written_signature(self, user_name):
+        return self.db.written_signature(user_name)
+
+
+    def get_objective(self, user, obj_num):
+        """Reads a single objective, flushing the pending save first."""
+        if user.name in self._pending:
+            self.flush()
+        with self._io_lock:
+            return self.db.get_objective(user, obj_num)
+
+
+    def version(self, user_name):
+        """Returns the version of the user's data, it goes up with every
+        save as soon as it is queued."""
+        return self._versions.get(user_name, 0)
+
+
+    def save_user_data(self, user, user_data):
+        """Queues the user data to be saved by the background thread."""
+        self._raise_error()
+        with self._cond:
+            user_name = user_data['user_name']
+            self._versions[user_name] = self._versions.get(user_name, 0) + 1
+            self._pending[user_name] = (user, copy.deepcopy(user_data))
+            self._prefetched.pop(user_name, None)
+            self._enqueue(('save', user_name))
+
+
+    def prefetch(self, user):
+        """Loads the user data in the background for the next read."""
+        with self._cond:
+            if user.name not in self._pending:
+                self._enqueue(('prefetch', user))
+
+
+    def flush(self):
+        """Blocks until every queued save is written."""
+        with self._cond:
+            self._cond.wait_for(lambda: not self._queue and not self._busy)
+        self._raise_error()
+
+
+    def _raise_error(self):
+        """Raises the error of the last save that failed, once."""
+        with self._cond:
+            error, self.error = self.error, None
+        if error:
+            raise error
+
+
+    def _enqueue(self, job):
+        key = (job[0], job[1] if job[0] == 'save' else job[1].name)
+        if key not in self._queued:
+            self._queued.add(key)
+            self._queue.append(job)
+            self._cond.notify_all()
+
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue)
+                kind, target = self._queue.popleft()
+                self._queued.discard((kind, target if kind == 'save' else target.name))
+                entry = self._pending.get(target) if kind == 'save' else None
+                self._busy = True
+
+            try:
+                if kind == 'save':
+                    with self._io_lock:
+                        self.db.save_user_data(*entry)
+                    signature = self.db.signature(target)
+                else:
+                    signature = self.db.signature(target.name)
+                    with self._io_lock:
+                        user_data = self.db.get_user_data(target)
+            except Exception as error:
+                if kind == 'save':
+                    self.error = error
+                    signature = None
+                else:
+                    # A prefetch that fails is only a read that is not ready.
+                    kind = None
+
+            with self._cond:
+                if kind == 'save' and self._pending.get(target) is entry:
+                    # Saved, or failed: the reads go to the file again
+                    # rather than serve data that was never written.
+                    del self._pending[target]
+                    if signature is not None:
+                        # What was written is what the file holds now, the
+                        # next read takes it without loading the file.
+                        self._prefetched[target] = (entry[0], signature, entry[1])
+                elif kind == 'prefetch' and target.name not in self._pending:
+                    self._prefetched[target.name] = (target, signature, user_data)
+                self._busy = False
+                self._cond.notify_all()
+
+
+class FileWatcher:
+    """Detects the changes made to a user's file by someone else.
+
+    It only compares the stat signature of the file (inode, size and
+    modification time) with the last one it has seen, so it is cheap to
+    call before every command. The writes of the DB itself are not
+    reported as changes.
+    """
+
+    def __init__(self, db, user_name):
+        self.db = db
+        self.user_name = user_name
+        self.last = db.signature(user_name)
+
+    def changed(self):
+        """Tells if the file was changed by someone else since the last call."""
+        current = self.db.signature(self.user_name)
+        if current == self.last:
+            return False
+        self.last = current
+        return current != self.db.written_signature(self.user_name)
 
 
 # Strategy design pattern
 class SecurityContext:
-    """Context"""
+    """Context, with the key the strategy derived for a file if it has one."""
 
-    def __init__(self, strategy):
+    def __init__(self, strategy, key=None):
         self.strategy = strategy
+        self.key = key
 
     def encrypt(self, message, key1, key2):
-        return self.strategy.encrypt(message, key1, key2)
+        return self.strategy.encrypt(message, key1, self.key or key2)
 
     def decrypt(self, encrypted_message, key1, key2):
-        return self.strategy.decrypt(encrypted_message, key1, key2)
+        return self.strategy.decrypt(encrypted_message, key1, self.key or key2)
     
 
 class SecurityStrategy(ABC):
@@ -103,10 +1183,17 @@ class SecurityStrategy(ABC):
     def decrypt():
         pass
 
+    def derive_key(self, password, secret=None):
+        """Returns the key2 of the messages of a file: the password, unless
+        the strategy derives its key from the secret of the file."""
+        return password
+
 
 class VigenereCipherAdapter(SecurityStrategy):
     """Strategy 1"""
 
+    name = 'vigenere'
+
     def __init__(self, vigenere_object):
         self.vigenere = vigenere_object
 
@@ -122,6 +1209,8 @@ class VigenereCipherAdapter(SecurityStrategy):
 class CaesarCipher(SecurityStrategy):
     """Strategy 2: Encrypts and decrypts the data."""
 
+    name = 'caesar'
+
     def __init__(self):
         self.alphabet = """ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789!@#$%^&*()-_=+[]{}|;:'\",.<>?/\\ """
 
@@ -162,6 +1251,58 @@ class CaesarCipher(SecurityStrategy):
         return decrypted_message
     
 
+class KeystreamCipher(SecurityStrategy):
+    """Strategy 3: XORs the UTF-8 bytes of the message with a keystream.
+
+    The keystream is SHAKE-256 of a key derived from key2 and of a random
+    nonce, so any text can be encrypted and the same text never gives the
+    same ciphertext twice. The whole buffer is XORed at once as a big
+    integer, and the nonce and the result are returned in base64.
+
+    The DB does not pass the password as key2 but a key derive_key() makes
+    from the secret of the file, which scrypt derives from the password
+    and the salt of the file.
+    """
+
+    name = 'keystream'
+    NONCE = 12
+
+    def __init__(self):
+        self._keys = {}
+
+
+    def encrypt(self, message, key1, key2):
+        """Encrypts the message with the password key2."""
+        nonce = os.urandom(self.NONCE)
+        data = self._xor(message.encode(), key2, nonce)
+        return base64.b64encode(nonce + data).decode('ascii')
+
+
+    def decrypt(self, encrypted_message, key1, key2):
+        """Decrypts the encrypted message with the password key2."""
+        data = base64.b64decode(encrypted_message)
+        return self._xor(data[self.NONCE:], key2, data[:self.NONCE]).decode()
+
+
+    def derive_key(self, password, secret):
+        """Derives key2 from the secret of the file."""
+        return hashlib.blake2b(secret, digest_size=32, person=b'tms-keystream').hexdigest()
+
+
+    def _xor(self, data, password, nonce):
+        stream = hashlib.shake_256(self._key(password) + nonce).digest(len(data))
+        number = int.from_bytes(data, 'little') ^ int.from_bytes(stream, 'little')
+        return number.to_bytes(len(data), 'little')
+
+
+    def _key(self, password):
+        key = self._keys.get(password)
+        if key is None:
+            key = self._keys[password] = hashlib.blake2b(
+                password.encode(), digest_size=32, person=b'tms-keystream').digest()
+        return key
+
+
 class VigenereCipher:
     """A foreign class that we have to create an adapter class for."""
 
@@ -249,7 +1390,8 @@ class Invoker:
         self._command = command
 
     def execute_command(self):
-        self._command.execute()
+        with metrics.timer('command_seconds', command=type(self._command).__name__):
+            self._command.execute()
 
 
 class AddObjective(Command):
@@ -366,6 +1508,62 @@ class ModifyTaskDate(Command):
         )
     
 
+class ClearTasks(Command):
+    """Concrete command"""
+    def __init__(self, receiver, objective_number):
+        self.receiver = receiver
+        self.objective_number = objective_number
+
+    def execute(self):
+        self.receiver.clear(self.objective_number)
+
+
+class DeleteTasks(Command):
+    """Concrete command"""
+    def __init__(self, receiver, task_numbers, objective_number):
+        self.receiver = receiver
+        self.task_numbers = task_numbers
+        self.objective_number = objective_number
+
+    def execute(self):
+        self.receiver.delete_many(
+            self.task_numbers,
+            self.objective_number
+        )
+
+
+class MoveTasks(Command):
+    """Concrete command"""
+    def __init__(self, receiver, task_numbers, objective_number, to_objective_number):
+        self.receiver = receiver
+        self.task_numbers = task_numbers
+        self.objective_number = objective_number
+        self.to_objective_number = to_objective_number
+
+    def execute(self):
+        self.receiver.move(
+            self.task_numbers,
+            self.objective_number,
+            self.to_objective_number
+        )
+
+
+class CopyTasks(Command):
+    """Concrete command"""
+    def __init__(self, receiver, task_numbers, objective_number, to_objective_number):
+        self.receiver = receiver
+        self.task_numbers = task_numbers
+        self.objective_number = objective_number
+        self.to_objective_number = to_objective_number
+
+    def execute(self):
+        self.receiver.copy(
+            self.task_numbers,
+            self.objective_number,
+            self.to_objective_number
+        )
+
+
 class Manager(ABC):
     """A contract for the managers."""
 
@@ -381,6 +1579,11 @@ class Manager(ABC):
     def modify(self):
         pass
 
+    def _notify(self, event, *args):
+        """Tells the observers (such as a TitleIndex) what changed."""
+        for observer in self.observers:
+            getattr(observer, event)(*args)
+
 
 # Memento design pattern.
 class Memento:
@@ -391,12 +1594,17 @@ class Memento:
         self.user_data = user_data
         self.db = db
         self.user = user
+        self.version = db.version(user.name)
 
     def restore(self):
+        """Returns False without saving if nothing was saved since."""
         self.originator.user_data = self.user_data
         self.originator.db = self.db
         self.originator.user = self.user
+        if self.db.version(self.user.name) == self.version:
+            return False
         self.db.save_user_data(self.user, self.user_data)
+        return True
 
 # Caretaker: Manages and keeps track of Mementos
 class Caretaker:
@@ -416,10 +1624,13 @@ class Caretaker:
 class ObjectivesManager(Manager):
     """Manages the objectives."""
 
-    def __init__(self, db, user):
+    def __init__(self, db, user, user_data=None):
         self.db = db
         self.user = user
-        self.user_data = self.db.get_user_data(self.user)
+        if user_data is None:
+            user_data = self.db.get_user_data(self.user)
+        self.user_data = user_data
+        self.observers = []
 
     def save(self):
         return Memento(self, self.user_data, self.db, self.user)
@@ -436,6 +1647,7 @@ class ObjectivesManager(Manager):
         self.user_data['objectives'].append(tmp_dict)
 
         self.db.save_user_data(self.user, self.user_data)
+        self._notify('objective_added', objective_title)
 
     def delete(self, objective_num):
         """Deletes the objective from the user data."""
@@ -444,24 +1656,32 @@ class ObjectivesManager(Manager):
         del self.user_data['objectives'][int(objective_num) - 1]
 
         self.db.save_user_data(self.user, self.user_data)
+        self._notify('objective_deleted', objective_num)
     
 
     def modify(self, new_title, obj_num):
         """Modifies the objective's title."""
         self.user_data = self.db.get_user_data(self.user)
 
-        self.user_data['objectives'][int(obj_num) - 1]['title'] = new_title
+        objective = self.user_data['objectives'][int(obj_num) - 1]
+        if objective['title'] == new_title:
+            return
+        objective['title'] = new_title
 
         self.db.save_user_data(self.user, self.user_data)
+        self._notify('objective_renamed', obj_num, new_title)
 
 
 class TasksManager(Manager):
     """Manages the tasks."""
 
-    def __init__(self, db, user):
+    def __init__(self, db, user, user_data=None):
         self.db = db
         self.user = user
-        self.user_data = self.db.get_user_data(self.user)
+        if user_data is None:
+            user_data = self.db.get_user_data(self.user)
+        self.user_data = user_data
+        self.observers = []
 
     def save(self):
         return Memento(self, self.user_data, self.db, self.user)
@@ -480,6 +1700,7 @@ class TasksManager(Manager):
         self.user_data['objectives'][index]['tasks'].append(tmp_dict)
 
         self.db.save_user_data(self.user, self.user_data)
+        self._notify('task_added', obj_num, task_title)
     
 
     def delete(self, task_num, obj_num):
@@ -492,6 +1713,7 @@ class TasksManager(Manager):
         del self.user_data['objectives'][index_obj]['tasks'][index_tsk]
 
         self.db.save_user_data(self.user, self.user_data)
+        self._notify('task_deleted', obj_num, task_num)
     
 
     def modify(self, new_title, new_dd, task_num, obj_num):
@@ -500,19 +1722,28 @@ class TasksManager(Manager):
 
         index_obj = int(obj_num) - 1
         index_tsk = int(task_num) - 1
-        self.user_data['objectives'][index_obj]['tasks'][index_tsk]['title'] = new_title
-        self.user_data['objectives'][index_obj]['tasks'][index_tsk]['due_date'] = new_dd
+        task = self.user_data['objectives'][index_obj]['tasks'][index_tsk]
+        if task['title'] == new_title and task['due_date'] == new_dd:
+            return
+        old_title, task['title'] = task['title'], new_title
+        task['due_date'] = new_dd
 
         self.db.save_user_data(self.user, self.user_data)
+        if old_title != new_title:
+            self._notify('task_renamed', obj_num, task_num, new_title)
     
 
     def modify_name(self, new_title, task_num, obj_num):
         self.user_data = self.db.get_user_data(self.user)
         index_obj = int(obj_num) - 1
         index_tsk = int(task_num) - 1
-        self.user_data['objectives'][index_obj]['tasks'][index_tsk]['title'] = new_title
+        task = self.user_data['objectives'][index_obj]['tasks'][index_tsk]
+        if task['title'] == new_title:
+            return
+        task['title'] = new_title
 
         self.db.save_user_data(self.user, self.user_data)
+        self._notify('task_renamed', obj_num, task_num, new_title)
     
 
     def modify_date(self, new_dd, task_num, obj_num):
@@ -520,6 +1751,100 @@ class TasksManager(Manager):
         
         index_obj = int(obj_num) - 1
         index_tsk = int(task_num) - 1
-        self.user_data['objectives'][index_obj]['tasks'][index_tsk]['due_date'] = new_dd
+        task = self.user_data['objectives'][index_obj]['tasks'][index_tsk]
+        if task['due_date'] == new_dd:
+            return
+        task['due_date'] = new_dd
+
+        self.db.save_user_data(self.user, self.user_data)
+
+
+    def clear(self, obj_num):
+        """Deletes every task of the objective."""
+        self.user_data = self.db.get_user_data(self.user)
+
+        index_obj = int(obj_num) - 1
+        if not self.user_data['objectives'][index_obj]['tasks']:
+            return
+        self.user_data['objectives'][index_obj]['tasks'] = []
+
+        self.db.save_user_data(self.user, self.user_data)
+        self._notify('tasks_cleared', obj_num)
+
+
+    def delete_many(self, task_nums, obj_num):
+        """Deletes several tasks (e.g. "1,3,5-7") with a single save."""
+        self.user_data = self.db.get_user_data(self.user)
 
-        self.db.save_user_data(self.user, self.user_data)
\ No newline at end of file
+        tasks = self.user_data['objectives'][int(obj_num) - 1]['tasks']
+        indices = self._indices(task_nums, len(tasks))
+        if not indices:
+            return
+        tasks[:] = [task for index, task in enumerate(tasks) if index not in indices]
+
+        self.db.save_user_data(self.user, self.user_data)
+        # The last first, so that the numbers of the others do not move.
+        for index in sorted(indices, reverse=True):
+            self._notify('task_deleted', obj_num, index + 1)
+
+
+    def move(self, task_nums, obj_num, to_obj_num):
+        """Moves the tasks to another objective with a single save."""
+        self._transfer(task_nums, obj_num, to_obj_num, keep=False)
+
+
+    def copy(self, task_nums, obj_num, to_obj_num):
+        """Copies the tasks to another objective with a single save."""
+        self._transfer(task_nums, obj_num, to_obj_num, keep=True)
+
+
+    def _transfer(self, task_nums, obj_num, to_obj_num, keep):
+        """The tasks whose title is already in the other objective stay
+        where they are."""
+        self.user_data = self.db.get_user_data(self.user)
+
+        source = self.user_data['objectives'][int(obj_num) - 1]['tasks']
+        target = self.user_data['objectives'][int(to_obj_num) - 1]['tasks']
+        if source is target:
+            return
+
+        titles = {task['title'] for task in target}
+        moved = set()
+        for index in sorted(self._indices(task_nums, len(source))):
+            if source[index]['title'] not in titles:
+                titles.add(source[index]['title'])
+                target.append(dict(source[index]))
+                moved.add(index)
+        if not moved:
+            return
+        titles = [source[index]['title'] for index in sorted(moved)]
+        if not keep:
+            source[:] = [task for index, task in enumerate(source) if index not in moved]
+
+        self.db.save_user_data(self.user, self.user_data)
+        for title in titles:
+            self._notify('task_added', to_obj_num, title)
+        if not keep:
+            for index in sorted(moved, reverse=True):
+                self._notify('task_deleted', obj_num, index + 1)
+
+
+    def _indices(self, task_nums, count):
+        """Turns task numbers like "1,3,5-7" into the indices {0, 2, 4, 5, 6},
+        leaving out the ones that are not in the list."""
+        return {num - 1 for num in self.parse_numbers(task_nums) if 0 < num <= count}
+
+
+    @staticmethod
+    def parse_numbers(task_nums):
+        """Turns task numbers like "3,1,5-7" into [3, 1, 5, 6, 7], in the
+        order they are given. Raises ValueError for a part that is not a
+        number or a range."""
+        numbers = []
+        for part in str(task_nums).replace(' ', '').split(','):
+            if '-' in part:
+                first, last = part.split('-')
+                numbers += range(int(first), int(last) + 1)
+            elif part:
+                numbers.append(int(part))
+        return numbers
@@ -0,0 +1,240 @@
+"""
+Opt-in instrumentation of the hot paths: histograms of timings and
+counters, exported as Prometheus text or JSON.
+
+The metrics are off by default and every helper then returns right away
+(or returns a shared object that does nothing), so the instrumented code
+pays about one function call. Setting the TMS_METRICS environment
+variable to a file path turns them on and dumps them to that file on
+exit and on SIGUSR1.
+"""
+
+import atexit
+import bisect
+import json
+import os
+import signal
+import threading
+import time
+
+
+# Upper bounds of the histogram buckets, in seconds.
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, float('inf'))
+
+enabled = False
+_path = None
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+
+
+class Histogram:
+    """Counts the observed values per bucket."""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+
+class _NullTimer:
+    """Stands in for the timers while the metrics are disabled."""
+
+    def __call__(self, phase):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def observe(self):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class _Phases:
+    """Sums the time spent in every phase of one operation, and observes
+    the sums once the operation is over."""
+
+    def __init__(self, name):
+        self.name = name
+        self.totals = {}
+        self.phase = None
+        self.start = None
+
+    def __call__(self, phase):
+        self.phase = phase
+        return self
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        self.totals[self.phase] = self.totals.get(self.phase, 0.0) + elapsed
+        return False
+
+    def observe(self):
+        for phase, total in self.totals.items():
+            observe(self.name, total, phase=phase)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name, value, **labels):
+    """Adds the value to the histogram."""
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        if key not in _histograms:
+            _histograms[key] = Histogram()
+        _histograms[key].observe(value)
+
+
+def count(name, value=1, **labels):
+    """Increments the counter."""
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def timer(name, **labels):
+    """Context manager that observes the time spent in its block."""
+    if not enabled:
+        return NULL_TIMER
+    return _Timer(name, labels)
+
+
+def phases(name):
+    """Times the phases of an operation: `with phases('read'): ...`,
+    then observe() records one value per phase."""
+    if not enabled:
+        return NULL_TIMER
+    return _Phases(name)
+
+
+def _labels(labels, extra=()):
+    pairs = [f'{key}="{value}"' for key, value in labels + tuple(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def to_prometheus():
+    """Returns the metrics in the Prometheus text format."""
+    lines = []
+    with _lock:
+        for name in sorted({name for name, _ in _histograms}):
+            lines.append(f'# TYPE {name} histogram')
+            for (key_name, labels), histogram in sorted(_histograms.items()):
+                if key_name != name:
+                    continue
+                for bound, total in zip(BUCKETS, histogram.cumulative()):
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{_labels(labels, [("le", le)])} {total}')
+                lines.append(f'{name}_sum{_labels(labels)} {histogram.sum}')
+                lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+        for name in sorted({name for name, _ in _counters}):
+            lines.append(f'# TYPE {name} counter')
+            for (key_name, labels), value in sorted(_counters.items()):
+                if key_name == name:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def to_json():
+    """Returns the metrics as a JSON document."""
+    with _lock:
+        document = {
+            'histograms': [
+                {
+                    'name': name,
+                    'labels': dict(labels),
+                    'buckets': dict(zip(
+                        ['+Inf' if bound == float('inf') else bound for bound in BUCKETS],
+                        histogram.cumulative())),
+                    'sum': histogram.sum,
+                    'count': histogram.count,
+                }
+                for (name, labels), histogram in sorted(_histograms.items())
+            ],
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(_counters.items())
+            ],
+        }
+    return json.dumps(document, indent=2)
+
+
+def dump(path=None):
+    """Writes the metrics to the file, as JSON if its name ends in .json."""
+    path = path or _path or 'metrics.prom'
+    text = to_json() if path.endswith('.json') else to_prometheus()
+    with open(path, 'w') as file:
+        file.write(text)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def enable(path=None):
+    """Turns the metrics on, they are dumped to the path on exit and on
+    SIGUSR1 if a path is given."""
+    global enabled, _path
+    enabled = True
+    if path and _path is None:
+        atexit.register(dump)
+        if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+            # The handler runs on the main thread, which may be holding the
+            # lock of the metrics, so the dump is left to another thread.
+            signal.signal(signal.SIGUSR1, lambda signum, frame: threading.Thread(
+                target=dump, name='metrics-dump', daemon=True).start())
+    _path = path or _path
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+if os.environ.get('TMS_METRICS'):
+    enable(os.environ['TMS_METRICS'])
@@ -0,0 +1,181 @@
+"""
+Analytics over the tasks: the tasks are loaded into NumPy columns and
+every statistic is computed with vectorized operations.
+"""
+
+import datetime
+import sys
+from collections import defaultdict
+from itertools import chain, count
+from operator import itemgetter
+
+from domain.models.dates import parse_date
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Edges (in days from today) of the overdue/upcoming distribution.
+BUCKET_EDGES = (-30, -7, 0, 1, 8, 31)
+BUCKET_LABELS = (
+    'overdue > 30 days',
+    'overdue 8-30 days',
+    'overdue 1-7 days',
+    'due today',
+    'due in 1-7 days',
+    'due in 8-30 days',
+    'due in > 30 days',
+)
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError('The stats need NumPy: pip install numpy')
+
+
+class TaskColumns:
+    """The tasks of one or more users laid out as NumPy columns."""
+
+    def __init__(self, objective_id, due, title_length, objective_titles,
+                 objective_user, user_names):
+        self.objective_id = objective_id
+        self.due = due
+        self.title_length = title_length
+        self.objective_titles = objective_titles
+        self.objective_user = objective_user
+        self.user_names = user_names
+
+    def __len__(self):
+        return len(self.objective_id)
+
+    @classmethod
+    def from_user_data(cls, users_data, today=None):
+        """Builds the columns from the user data dictionaries."""
+        _require_numpy()
+        today = today or datetime.date.today()
+
+        users_data = list(users_data)
+        user_names = [user_data['user_name'] for user_data in users_data]
+        objectives = [user_data['objectives'] for user_data in users_data]
+        objective_user = np.repeat(np.arange(len(user_names), dtype=np.int32),
+                                   [len(user_objectives) for user_objectives in objectives])
+        objectives = list(chain.from_iterable(objectives))
+        objective_id = np.repeat(np.arange(len(objectives), dtype=np.int32),
+                                 [len(objective['tasks']) for objective in objectives])
+        tasks = list(chain.from_iterable(objective['tasks'] for objective in objectives))
+
+        # The due dates repeat a lot, so every distinct string gets a code
+        # the first time it is seen, and is parsed once.
+        codes = defaultdict(count().__next__)
+        due_codes = np.fromiter(
+            map(codes.__getitem__, map(itemgetter('due_date'), tasks)), np.intp, len(tasks))
+        unique_dates = np.array(
+            [parse_date(text, today) or 'NaT' for text in codes], dtype='datetime64[D]')
+
+        return cls(
+            objective_id=objective_id,
+            due=unique_dates[due_codes],
+            title_length=np.fromiter(
+                map(len, map(itemgetter('title'), tasks)), np.int32, len(tasks)),
+            objective_titles=[objective['title'] for objective in objectives],
+            objective_user=objective_user,
+            user_names=user_names)
+
+
+class TaskStats:
+    """Per objective counts, overdue/upcoming distribution and due date histogram."""
+
+    def __init__(self, columns, today=None):
+        _require_numpy()
+        self.columns = columns
+        self.today = np.datetime64(today or datetime.date.today(), 'D')
+
+        objectives = len(columns.objective_titles)
+        has_date = ~np.isnat(columns.due)
+        days = (columns.due[has_date] - self.today).astype(np.int64)
+        dated_ids = columns.objective_id[has_date]
+
+        self.total = len(columns)
+        self.undated = int(self.total - has_date.sum())
+        self.per_objective = np.bincount(columns.objective_id, minlength=objectives)
+        self.overdue = np.bincount(dated_ids[days < 0], minlength=objectives)
+        self.upcoming = np.bincount(dated_ids[days >= 0], minlength=objectives)
+        self.mean_title_length = np.divide(
+            np.bincount(columns.objective_id, weights=columns.title_length,
+                        minlength=objectives),
+            self.per_objective,
+            out=np.zeros(objectives),
+            where=self.per_objective > 0)
+
+        buckets = np.searchsorted(np.array(BUCKET_EDGES), days, side='right')
+        self.distribution = np.bincount(buckets, minlength=len(BUCKET_LABELS))
+
+        months = columns.due[has_date].astype('datetime64[M]').astype(np.int64)
+        first = months.min() if len(months) else 0
+        counts = np.bincount(months - first)
+        present = np.flatnonzero(counts)
+        self.histogram = ((present + first).astype('datetime64[M]'), counts[present])
+
+    def report(self):
+        """Returns the statistics as plain Python types."""
+        columns = self.columns
+        months, counts = self.histogram
+        return {
+            'today': str(self.today),
+            'tasks': self.total,
+            'overdue': int(self.overdue.sum()),
+            'upcoming': int(self.upcoming.sum()),
+            'undated': self.undated,
+            'objectives': [
+                {
+                    'user_name': columns.user_names[columns.objective_user[index]],
+                    'title': title,
+                    'tasks': int(self.per_objective[index]),
+                    'overdue': int(self.overdue[index]),
+                    'upcoming': int(self.upcoming[index]),
+                    'mean_title_length': round(float(self.mean_title_length[index]), 2),
+                }
+                for index, title in enumerate(columns.objective_titles)
+            ],
+            'distribution': dict(zip(BUCKET_LABELS, self.distribution.tolist())),
+            'histogram': dict(zip(months.astype(str).tolist(), counts.tolist())),
+        }
+
+
+def load_directory(db, users=None):
+    """Loads the user data of the given users, or of every unprotected
+    user in the DB directory."""
+
+    if users is None:
+        from domain.models.logic import SimpleUser
+
+        users = [SimpleUser(user_name) for user_name in db.user_names()]
+
+    for user in users:
+        user_data = db.get_user_data(user)
+        if user_data:
+            yield user_data
+
+
+def main(argv):
+    """python -m domain.models.stats [--all | <user> [<password>]]"""
+
+    from domain.factory import UserFactory, StrategyFactory
+    from domain.models.logic import DB, SecurityContext
+    from domain.models.UI import StatsUI
+
+    password = argv[1] if len(argv) > 1 else None
+    db = DB(SecurityContext(StrategyFactory().create(password)))
+    if not argv or argv[0] == '--all':
+        users = None
+    else:
+        users = [UserFactory().create_user(argv[0], password)]
+
+    columns = TaskColumns.from_user_data(load_directory(db, users))
+    StatsUI().display(TaskStats(columns).report())
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,358 @@
+"""
+Title prefixes instead of numbers: a trie over the titles of the user's
+objectives and one over the tasks of every objective, so that finding the
+title a prefix stands for takes as long as the prefix and the title, no
+matter how many there are.
+
+The tries are kept up to date by the managers, which tell a TitleIndex
+about every title they add, delete or rename, and where it is.
+"""
+
+
+class _Node:
+    __slots__ = ('children', 'count', 'ends')
+
+    def __init__(self):
+        self.children = {}
+        # Titles that go through the node, and that end at it.
+        self.count = 0
+        self.ends = 0
+
+
+class TitleTrie:
+    """Prefix tree over titles, a title can be in it more than once."""
+
+    def __init__(self, titles=()):
+        self.root = _Node()
+        for title in titles:
+            self.insert(title)
+
+    def __len__(self):
+        return self.root.count
+
+    def __contains__(self, title):
+        node = self._find(title)
+        return node is not None and node.ends > 0
+
+
+    def insert(self, title):
+        node = self.root
+        node.count += 1
+        for char in title:
+            node = node.children.setdefault(char, _Node())
+            node.count += 1
+        node.ends += 1
+
+
+    def remove(self, title):
+        """Removes the title once, does nothing if it is not in the trie."""
+        if title not in self:
+            return
+        node = self.root
+        node.count -= 1
+        for char in title:
+            child = node.children[char]
+            child.count -= 1
+            if not child.count:
+                del node.children[char]
+                return
+            node = child
+        node.ends -= 1
+
+
+    def unique(self, prefix):
+        """Returns the title that is the prefix, or else the only title that
+        starts with it; None if there is no such title or more than one."""
+        node = self._find(prefix)
+        if node is None:
+            return None
+        if node.ends:
+            return prefix
+        if node.count != 1:
+            return None
+        title = [prefix]
+        while not node.ends:
+            char, node = next(iter(node.children.items()))
+            title.append(char)
+        return ''.join(title)
+
+
+    def complete(self, prefix, limit=10):
+        """Returns up to limit titles that start with the prefix, sorted."""
+        node = self._find(prefix)
+        titles = []
+        if node is None:
+            return titles
+        stack = [(prefix, node)]
+        while stack and len(titles) < limit:
+            title, node = stack.pop()
+            if node.ends:
+                titles.append(title)
+            stack.extend((title + char, child)
+                         for char, child in sorted(node.children.items(), reverse=True))
+        return titles
+
+
+    def _find(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+
+class TitleList:
+    """The titles of a list of items, in the order of the items.
+
+    Every item gets an id when it is added, the ids of the items still in
+    the list are counted by a Fenwick tree, so that the position of an
+    item (the ids before it) and the item at a position are found in
+    O(log n), and deleting an item does not move the ones after it.
+    """
+
+    def __init__(self, titles=()):
+        self.trie = TitleTrie()
+        # The title of every id, None once the item is deleted.
+        self._titles = []
+        self._ids = {}
+        self._tree = [0]
+        for title in titles:
+            self.append(title)
+
+    def __len__(self):
+        return len(self.trie)
+
+
+    def append(self, title):
+        if len(self._titles) + 1 >= len(self._tree):
+            self._grow()
+        item_id = len(self._titles)
+        self._titles.append(title)
+        self._ids.setdefault(title, []).append(item_id)
+        self.trie.insert(title)
+        self._add(item_id, 1)
+
+
+    def delete(self, position):
+        """Deletes the item at the position, returns its title."""
+        item_id = self._select(position)
+        title = self._forget(item_id)
+        self._titles[item_id] = None
+        self._add(item_id, -1)
+        return title
+
+
+    def rename(self, position, title):
+        item_id = self._select(position)
+        self._forget(item_id)
+        self._titles[item_id] = title
+        self._ids.setdefault(title, []).append(item_id)
+        self.trie.insert(title)
+
+
+    def title(self, position):
+        return self._titles[self._select(position)]
+
+
+    def position(self, title):
+        """Returns the position of the first item with the title, None if
+        there is none."""
+        ids = self._ids.get(title)
+        if not ids:
+            return None
+        return self._rank(min(ids))
+
+
+    def _forget(self, item_id):
+        title = self._titles[item_id]
+        self._ids[title].remove(item_id)
+        if not self._ids[title]:
+            del self._ids[title]
+        self.trie.remove(title)
+        return title
+
+
+    def _grow(self):
+        """Gives the items still in the list new ids and makes room for
+        as many more."""
+        self._titles = [title for title in self._titles if title is not None]
+        self._ids = {}
+        for item_id, title in enumerate(self._titles):
+            self._ids.setdefault(title, []).append(item_id)
+        size = max(16, 2 * len(self._titles))
+        tree = [0] * (size + 1)
+        for index in range(1, size + 1):
+            tree[index] += index <= len(self._titles)
+            parent = index + (index & -index)
+            if parent <= size:
+                tree[parent] += tree[index]
+        self._tree = tree
+
+
+    def _add(self, item_id, delta):
+        index = item_id + 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+
+    def _rank(self, item_id):
+        """The number of items before the id."""
+        count, index = 0, item_id
+        while index:
+            count += self._tree[index]
+            index -= index & -index
+        return count
+
+
+    def _select(self, position):
+        """The id of the item at the position."""
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        index, remaining = 0, position + 1
+        step = 1 << ((len(self._tree) - 1).bit_length() - 1)
+        while step:
+            if index + step < len(self._tree) and self._tree[index + step] < remaining:
+                index += step
+                remaining -= self._tree[index]
+            step >>= 1
+        return index
+
+
+class TitleIndex:
+    """Resolves title prefixes to objective and task numbers for one user.
+
+    The objectives and the tasks of every objective are kept in TitleLists
+    in the order of the user data; the tasks of an objective are listed
+    the first time they are needed. The managers tell the index what they
+    changed by number, so the lists follow the user data without being
+    built again. A number found is checked against the user data, and the
+    index built again if it went out of step (e.g. after an undo).
+    """
+
+    def __init__(self, user_data=None):
+        self.reset(user_data)
+
+
+    def reset(self, user_data):
+        """Builds the index again, after the data changed as a whole."""
+        objectives = (user_data or {}).get('objectives', [])
+        self.objectives = TitleList(objective['title'] for objective in objectives)
+        self._tasks = [None] * len(objectives)
+        self._stale = False
+
+
+    def objective_number(self, prefix, user_data):
+        """Returns the number of the objective the prefix stands for, None
+        if it stands for no objective or for more than one."""
+        self._check(user_data)
+        number = self._number(self.objectives, prefix, user_data['objectives'])
+        if number is False:
+            self.reset(user_data)
+            number = self._number(self.objectives, prefix, user_data['objectives'])
+        return number or None
+
+
+    def task_number(self, obj_num, prefix, user_data):
+        """Returns the number of the task of the objective the prefix stands
+        for, None if it stands for no task or for more than one."""
+        tasks = user_data['objectives'][int(obj_num) - 1]['tasks']
+        number = self._number(self.tasks(obj_num, user_data), prefix, tasks)
+        if number is False:
+            self.reset(user_data)
+            number = self._number(self.tasks(obj_num, user_data), prefix, tasks)
+        return number or None
+
+
+    def complete(self, prefix, user_data, obj_num=None, limit=10):
+        """Returns the titles of the objectives, or of the tasks of the
+        objective, that start with the prefix."""
+        self._check(user_data)
+        if obj_num is None:
+            return self.objectives.trie.complete(prefix, limit)
+        return self.tasks(obj_num, user_data).trie.complete(prefix, limit)
+
+
+    def tasks(self, obj_num, user_data):
+        """Returns the TitleList of the tasks of the objective."""
+        self._check(user_data)
+        index = int(obj_num) - 1
+        if self._tasks[index] is None:
+            self._tasks[index] = TitleList(
+                task['title'] for task in user_data['objectives'][index]['tasks'])
+        return self._tasks[index]
+
+
+    def _check(self, user_data):
+        if self._stale or len(self._tasks) != len(user_data['objectives']):
+            self.reset(user_data)
+
+
+    def _number(self, titles, prefix, items):
+        """Returns the number of the item whose title the prefix stands for,
+        None if there is no such title, and False if the list is not the
+        one of the items anymore."""
+
+        title = titles.trie.unique(prefix)
+        if title is None:
+            return None
+        position = titles.position(title)
+        if len(titles) != len(items) or items[position]['title'] != title:
+            return False
+        return str(position + 1)
+
+
+    # What the managers tell the index, by number. A number the index
+    # does not have means it is out of step, it is built again at the
+    # next lookup.
+
+    def objective_added(self, title):
+        self.objectives.append(title)
+        self._tasks.append(None)
+
+
+    def objective_deleted(self, obj_num):
+        try:
+            self.objectives.delete(int(obj_num) - 1)
+            del self._tasks[int(obj_num) - 1]
+        except IndexError:
+            self._stale = True
+
+
+    def objective_renamed(self, obj_num, title):
+        try:
+            self.objectives.rename(int(obj_num) - 1, title)
+        except IndexError:
+            self._stale = True
+
+
+    def task_added(self, obj_num, title):
+        self._change_tasks(obj_num, 'append', title)
+
+
+    def task_deleted(self, obj_num, task_num):
+        self._change_tasks(obj_num, 'delete', int(task_num) - 1)
+
+
+    def task_renamed(self, obj_num, task_num, title):
+        self._change_tasks(obj_num, 'rename', int(task_num) - 1, title)
+
+
+    def tasks_cleared(self, obj_num):
+        if 0 < int(obj_num) <= len(self._tasks):
+            self._tasks[int(obj_num) - 1] = TitleList()
+        else:
+            self._stale = True
+
+
+    def _change_tasks(self, obj_num, change, *args):
+        """Changes the tasks of the objective, if they are listed yet."""
+        index = int(obj_num) - 1
+        if not 0 <= index < len(self._tasks):
+            self._stale = True
+        elif self._tasks[index] is not None:
+            try:
+                getattr(self._tasks[index], change)(*args)
+            except IndexError:
+                self._stale = True
@@ -0,0 +1,107 @@
+"""Tests of AsyncDB: coalescing the saves of a user, reading the saves
+that are still pending and raising the error of a save that failed."""
+
+import copy
+import threading
+
+import pytest
+
+from domain.models.logic import AsyncDB, SimpleUser
+
+
+class StubDB:
+    """Keeps the files in memory; a save waits for the gate to open."""
+
+    password_manager = None
+
+    def __init__(self):
+        self.files = {}
+        self.saves = []
+        self.loads = 0
+        self.error = None
+        self.gate = threading.Event()
+        self.gate.set()
+        self.saving = threading.Event()
+
+    def save_user_data(self, user, user_data):
+        self.saving.set()
+        assert self.gate.wait(5)
+        if self.error:
+            raise self.error
+        self.saves.append(copy.deepcopy(user_data))
+        self.files[user.name] = copy.deepcopy(user_data)
+
+    def get_user_data(self, user):
+        self.loads += 1
+        return copy.deepcopy(self.files.get(user.name, {'user_name': user.name, 'objectives': []}))
+
+    def signature(self, user_name):
+        return len(self.saves)
+
+
+def user_data(*titles):
+    return {'user_name': 'ann', 'objectives': [{'title': title, 'tasks': []} for title in titles]}
+
+
+@pytest.fixture
+def stub():
+    return StubDB()
+
+
+@pytest.fixture
+def user():
+    return SimpleUser('ann')
+
+
+def hold_saves(db, stub, user):
+    """Starts a save that waits for the gate, the next ones are queued."""
+    stub.gate.clear()
+    db.save_user_data(user, user_data('first'))
+    assert stub.saving.wait(5)
+
+
+def test_saves_of_a_user_are_coalesced(stub, user):
+    db = AsyncDB(stub)
+    hold_saves(db, stub, user)
+    for number in range(5):
+        db.save_user_data(user, user_data('first', f'objective {number}'))
+    assert db.version('ann') == 6
+
+    stub.gate.set()
+    db.flush()
+    assert stub.saves == [user_data('first'), user_data('first', 'objective 4')]
+
+
+def test_reads_see_the_pending_save(stub, user):
+    db = AsyncDB(stub)
+    hold_saves(db, stub, user)
+    saved = user_data('first', 'second')
+    db.save_user_data(user, saved)
+    saved['objectives'].clear()
+
+    # Neither the file nor the caller's later changes are read.
+    assert db.get_user_data(user) == user_data('first', 'second')
+    assert stub.loads == 0
+    stub.gate.set()
+    db.flush()
+    assert stub.files['ann'] == user_data('first', 'second')
+
+
+def test_failed_save_is_raised_once_then_the_file_is_read(stub, user):
+    stub.files['ann'] = user_data('on disk')
+    db = AsyncDB(stub)
+    stub.error = OSError('disk full')
+    hold_saves(db, stub, user)
+    stub.gate.set()
+
+    with pytest.raises(OSError, match='disk full'):
+        db.flush()
+    db.flush()
+    # The data that was never written is not served.
+    assert db.get_user_data(user) == user_data('on disk')
+    assert stub.loads == 1
+
+    stub.error = None
+    db.save_user_data(user, user_data('again'))
+    db.flush()
+    assert stub.files['ann'] == user_data('again')
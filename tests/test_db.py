@@ -0,0 +1,165 @@
+"""Tests of the record format of DB: round trips, the single-dictionary
+format, appends, compaction and the files that cannot be read."""
+
+import os
+
+import pytest
+
+from domain.factory import UserFactory, StrategyFactory
+from domain.models.logic import DB, SecurityContext
+
+
+PASSWORDS = {
+    'none': None,
+    'vigenere': 'ab12',
+    'caesar': 'secret-key',
+    'keystream': 'secret-key',
+}
+
+
+def make_user_data(user_name='ann', objectives=3, tasks=4):
+    return {
+        'user_name': user_name,
+        'objectives': [
+            {'title': f'objective {number}',
+             'tasks': [{'title': f'task {number}.{task}', 'due_date': f'2025-01-{task + 1:02d}'}
+                       for task in range(tasks)]}
+            for number in range(objectives)],
+    }
+
+
+def make_db(directory, security='keystream', user_name='ann'):
+    password = PASSWORDS[security]
+    name = security if password else None
+    db = DB.new(SecurityContext(StrategyFactory().create(password, name)))
+    db.directory = str(directory)
+    return db, UserFactory().create_user(user_name, password)
+
+
+def header(db, user):
+    with open(db.path(user.name), 'rb') as file:
+        return file.readline()
+
+
+@pytest.mark.parametrize('security', PASSWORDS)
+def test_round_trip(tmp_path, security):
+    db, user = make_db(tmp_path, security)
+    user_data = make_user_data()
+    db.save_user_data(user, user_data)
+
+    other, _ = make_db(tmp_path, security)
+    assert other.get_user_data(user) == user_data
+    assert other.get_objective(user, 2) == user_data['objectives'][1]
+    assert other.get_task(user, 3, 4) == user_data['objectives'][2]['tasks'][3]
+
+
+def test_new_user_has_no_objectives(tmp_path):
+    db, user = make_db(tmp_path)
+    assert db.get_user_data(user) == {'user_name': 'ann', 'objectives': []}
+
+
+@pytest.mark.parametrize('security', ['none', 'vigenere', 'caesar'])
+def test_reads_single_dictionary_format(tmp_path, security):
+    db, user = make_db(tmp_path, security)
+    user_data = make_user_data()
+    text = str(user_data)
+    if user.password:
+        strategy = StrategyFactory().create(
+            user.password, StrategyFactory().legacy_name(user.password))
+        text = strategy.encrypt(text, len(user.password), user.password)
+    with open(db.path(user.name), 'w') as file:
+        file.write(text)
+
+    assert db.get_user_data(user) == user_data
+    assert db.get_objective(user, 1) == user_data['objectives'][0]
+
+    # The next save moves the file to the record format.
+    db.save_user_data(user, user_data)
+    assert header(db, user).startswith(DB.MAGIC + b' v=')
+    assert make_db(tmp_path, security)[0].get_user_data(user) == user_data
+
+
+def test_save_appends_only_the_changed_records(tmp_path):
+    db, user = make_db(tmp_path)
+    user_data = make_user_data()
+    db.save_user_data(user, user_data)
+    first_header = header(db, user)
+    size = os.path.getsize(db.path(user.name))
+
+    encoded = []
+    encode = db._encode
+    db._encode = lambda *args: encoded.append(args[0]) or encode(*args)
+    user_data['objectives'][1]['tasks'][2]['due_date'] = '2030-12-31'
+    db.save_user_data(user, user_data)
+
+    assert encoded == [str(user_data['objectives'][1]['tasks'][2])]
+    assert header(db, user) == first_header
+    assert os.path.getsize(db.path(user.name)) > size
+    assert make_db(tmp_path)[0].get_user_data(user) == user_data
+
+
+def test_rewrites_the_file_once_stale_records_outweigh_live_ones(tmp_path):
+    db, user = make_db(tmp_path)
+    db.COMPACT_MIN = 0
+    user_data = make_user_data()
+    db.save_user_data(user, user_data)
+    first_header = header(db, user)
+
+    sizes = [os.path.getsize(db.path(user.name))]
+    for number in range(20):
+        user_data['objectives'][0]['tasks'][0]['due_date'] = f'2030-01-{number + 1:02d}'
+        db.save_user_data(user, user_data)
+        sizes.append(os.path.getsize(db.path(user.name)))
+        if header(db, user) != first_header:
+            break
+
+    # A few saves are appended before the file is rewritten.
+    assert header(db, user) != first_header
+    assert sizes[1] > sizes[0] and len(sizes) > 2
+    assert sizes[-1] < sizes[-2]
+    assert make_db(tmp_path)[0].get_user_data(user) == user_data
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+@pytest.mark.parametrize('security', ['none', 'keystream'])
+def test_wrong_login_is_rejected(tmp_path, security):
+    db, user = make_db(tmp_path, security)
+    db.save_user_data(user, make_user_data())
+
+    wrong = UserFactory().create_user(user.name, 'wrong-password')
+    assert db.get_user_data(wrong) is None
+    assert db.get_objective(wrong, 1) is None
+
+
+@pytest.mark.parametrize('security', ['none', 'keystream'])
+def test_truncated_file_cannot_be_read(tmp_path, security):
+    db, user = make_db(tmp_path, security)
+    user_data = make_user_data(objectives=2, tasks=2)
+    db.save_user_data(user, user_data)
+    with open(db.path(user.name), 'rb') as file:
+        data = file.read()
+
+    for length in range(len(data)):
+        with open(db.path(user.name), 'wb') as file:
+            file.write(data[:length])
+        # Only the trailing newline can be cut without losing anything.
+        assert db.get_user_data(user) in (None, user_data)
+        db.get_objective(user, 1)
+
+
+def test_reload_reuses_the_records_that_did_not_change(tmp_path):
+    db, user = make_db(tmp_path)
+    other, _ = make_db(tmp_path)
+    user_data = make_user_data()
+    db.save_user_data(user, user_data)
+    loaded = db.get_user_data(user)
+
+    changed = other.get_user_data(user)
+    changed['objectives'][0]['tasks'][0]['title'] = 'changed'
+    other.save_user_data(user, changed)
+
+    decoded = []
+    decode = db._decode
+    db._decode = lambda *args: decoded.append(args[0]) or decode(*args)
+    assert db.reload_user_data(user, loaded) == changed
+    assert len(decoded) == 1
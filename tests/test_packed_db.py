@@ -0,0 +1,110 @@
+"""Tests of PackedDB: reopening the segments, compaction and the export
+to and import from the layout of DB."""
+
+import os
+
+import pytest
+
+from domain.factory import UserFactory, StrategyFactory
+from domain.models.logic import DB, PackedDB, SecurityContext
+
+
+def make_user_data(user_name, tasks=3):
+    return {
+        'user_name': user_name,
+        'objectives': [
+            {'title': f'{user_name} objective',
+             'tasks': [{'title': f'task {task}', 'due_date': f'2025-02-{task + 1:02d}'}
+                       for task in range(tasks)]}],
+    }
+
+
+@pytest.fixture
+def cipher():
+    return SecurityContext(StrategyFactory().create('secret-key', 'keystream'))
+
+
+@pytest.fixture
+def users():
+    return [UserFactory().create_user(f'user{number}', 'secret-key') for number in range(5)]
+
+
+@pytest.fixture
+def db(tmp_path, cipher):
+    db = PackedDB.new(cipher, str(tmp_path / 'packed'))
+    yield db
+    db.close()
+
+
+def saved(db, users):
+    return {user.name: db.get_user_data(user) for user in users}
+
+
+def test_is_not_the_shared_data_source(db, tmp_path, cipher):
+    assert PackedDB.new(cipher, str(tmp_path / 'other')) is not db
+
+
+def test_reopen_finds_the_last_frame_of_every_user(db, tmp_path, cipher, users):
+    for user in users:
+        db.save_user_data(user, make_user_data(user.name))
+    user_data = make_user_data(users[0].name, tasks=5)
+    db.save_user_data(users[0], user_data)
+    expected = saved(db, users)
+    assert expected[users[0].name] == user_data
+
+    other = PackedDB.new(cipher, str(tmp_path / 'packed'))
+    assert other.user_names() == sorted(user.name for user in users)
+    assert saved(other, users) == expected
+    other.close()
+
+    db.open(str(tmp_path / 'packed'))
+    assert saved(db, users) == expected
+
+
+def test_reopen_skips_a_frame_cut_short(db, tmp_path, cipher, users):
+    db.save_user_data(users[0], make_user_data(users[0].name))
+    db.close()
+    segment = os.path.join(str(tmp_path / 'packed'), os.listdir(tmp_path / 'packed')[0])
+    with open(segment, 'ab') as file:
+        file.write(b'5 1000\nuser1TMS1')
+
+    db.open(str(tmp_path / 'packed'))
+    assert db.user_names() == [users[0].name]
+    assert db.get_user_data(users[0]) == make_user_data(users[0].name)
+
+
+def test_compact_keeps_only_the_live_frames(db, tmp_path, users):
+    for task in range(10):
+        for user in users:
+            db.save_user_data(user, make_user_data(user.name, tasks=task))
+    expected = saved(db, users)
+    directory = str(tmp_path / 'packed')
+    size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+    db.compact(wait=True)
+
+    assert sum(os.path.getsize(os.path.join(directory, name))
+               for name in os.listdir(directory)) < size
+    assert saved(db, users) == expected
+    db.save_user_data(users[1], make_user_data(users[1].name, tasks=1))
+    expected[users[1].name] = make_user_data(users[1].name, tasks=1)
+    db.open(directory)
+    assert saved(db, users) == expected
+
+
+def test_export_and_import_files(db, tmp_path, cipher, users):
+    for user in users:
+        db.save_user_data(user, make_user_data(user.name))
+    expected = saved(db, users)
+
+    files = str(tmp_path / 'files')
+    db.export_files(files)
+    assert sorted(os.listdir(files)) == sorted(f'{user.name}.txt' for user in users)
+    file_db = DB.new(cipher)
+    file_db.directory = files
+    assert saved(file_db, users) == expected
+
+    other = PackedDB.new(cipher, str(tmp_path / 'imported'))
+    other.import_files(files)
+    assert saved(other, users) == expected
+    other.close()
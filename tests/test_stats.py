@@ -0,0 +1,88 @@
+"""Tests of the task columns and the statistics computed over them."""
+
+import datetime
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from domain.models.stats import BUCKET_LABELS, TaskColumns, TaskStats
+
+
+TODAY = datetime.date(2025, 6, 15)
+
+
+def due_in(days):
+    return str(TODAY + datetime.timedelta(days=days))
+
+
+def users_data():
+    return [
+        {'user_name': 'ann', 'objectives': [
+            {'title': 'exam', 'tasks': [
+                {'title': 'read', 'due_date': due_in(-3)},
+                {'title': 'write', 'due_date': due_in(2)},
+                {'title': 'rest', 'due_date': 'some day'}]},
+            {'title': 'empty', 'tasks': []}]},
+        {'user_name': 'bob', 'objectives': []},
+        {'user_name': 'eve', 'objectives': [
+            {'title': 'trip', 'tasks': [{'title': 'pack', 'due_date': 'tomorrow'}]}]},
+    ]
+
+
+def test_columns_from_a_generator():
+    columns = TaskColumns.from_user_data((user_data for user_data in users_data()), TODAY)
+
+    assert len(columns) == 4
+    assert columns.user_names == ['ann', 'bob', 'eve']
+    assert columns.objective_titles == ['exam', 'empty', 'trip']
+    assert columns.objective_user.tolist() == [0, 0, 2]
+    assert columns.objective_id.tolist() == [0, 0, 0, 2]
+    assert columns.title_length.tolist() == [4, 5, 4, 4]
+    assert [str(date) for date in columns.due] == [due_in(-3), due_in(2), 'NaT', due_in(1)]
+
+
+def test_no_tasks():
+    columns = TaskColumns.from_user_data(iter([{'user_name': 'bob', 'objectives': []}]), TODAY)
+    report = TaskStats(columns, TODAY).report()
+
+    assert len(columns) == 0
+    assert report['tasks'] == report['undated'] == 0
+    assert report['objectives'] == [] and report['histogram'] == {}
+    assert sum(report['distribution'].values()) == 0
+
+
+def test_report():
+    report = TaskStats(TaskColumns.from_user_data(users_data(), TODAY), TODAY).report()
+
+    assert (report['tasks'], report['overdue'], report['upcoming'], report['undated']) == (4, 1, 2, 1)
+    exam, empty, trip = report['objectives']
+    assert (exam['tasks'], exam['overdue'], exam['upcoming']) == (3, 1, 1)
+    assert exam['mean_title_length'] == 4.33
+    assert empty['tasks'] == 0 and empty['mean_title_length'] == 0
+    assert trip['user_name'] == 'eve'
+    assert report['histogram'] == {'2025-06': 3}
+
+
+@pytest.mark.parametrize('days, label', [
+    (-31, 'overdue > 30 days'),
+    (-30, 'overdue 8-30 days'),
+    (-8, 'overdue 8-30 days'),
+    (-7, 'overdue 1-7 days'),
+    (-1, 'overdue 1-7 days'),
+    (0, 'due today'),
+    (1, 'due in 1-7 days'),
+    (7, 'due in 1-7 days'),
+    (8, 'due in 8-30 days'),
+    (30, 'due in 8-30 days'),
+    (31, 'due in > 30 days'),
+])
+def test_distribution_buckets(days, label):
+    user_data = {'user_name': 'ann', 'objectives': [
+        {'title': 'one', 'tasks': [{'title': 'task', 'due_date': due_in(days)}]}]}
+    distribution = TaskStats(TaskColumns.from_user_data([user_data], TODAY), TODAY) \
+        .report()['distribution']
+
+    assert list(distribution) == list(BUCKET_LABELS)
+    assert {name: count for name, count in distribution.items() if count} == {label: 1}
+
@@ -0,0 +1,87 @@
+"""Tests of the title index: it follows the managers' changes without
+being built again."""
+
+import random
+
+from domain.models.logic import ObjectivesManager, TasksManager
+from domain.models.trie import TitleIndex, TitleList
+
+
+class MemoryDB:
+    def __init__(self, user_data):
+        self.user_data = user_data
+
+    def get_user_data(self, user):
+        return self.user_data
+
+    def save_user_data(self, user, user_data):
+        self.user_data = user_data
+
+
+def test_title_list_follows_a_list():
+    rng = random.Random(1)
+    titles, expected = TitleList(), []
+    for _ in range(2000):
+        choice = rng.random()
+        if choice < 0.5 or not expected:
+            title = f'title {rng.randrange(20)}'
+            titles.append(title)
+            expected.append(title)
+        elif choice < 0.8:
+            position = rng.randrange(len(expected))
+            assert titles.delete(position) == expected.pop(position)
+        else:
+            position = rng.randrange(len(expected))
+            expected[position] = f'renamed {rng.randrange(5)}'
+            titles.rename(position, expected[position])
+
+        assert len(titles) == len(expected)
+        for position, title in enumerate(expected):
+            assert titles.title(position) == title
+            assert titles.position(title) == expected.index(title)
+
+
+def test_index_follows_the_managers():
+    rng = random.Random(2)
+    db = MemoryDB({'user_name': 'ann', 'objectives': []})
+    index = TitleIndex(db.user_data)
+    objectives = ObjectivesManager(db, None, db.user_data)
+    tasks = TasksManager(db, None, db.user_data)
+    objectives.observers.append(index)
+    tasks.observers.append(index)
+
+    for _ in range(1000):
+        count = len(db.user_data['objectives'])
+        choice = rng.random()
+        if choice < 0.1 or not count:
+            objectives.add(f'objective {rng.randrange(20)}')
+        elif choice < 0.15:
+            objectives.delete(rng.randint(1, count))
+        elif choice < 0.2:
+            objectives.modify(f'objective {rng.randrange(20)}', rng.randint(1, count))
+        else:
+            obj_num = rng.randint(1, count)
+            size = len(db.user_data['objectives'][obj_num - 1]['tasks'])
+            choice = rng.random()
+            if choice < 0.4 or not size:
+                tasks.add(f'task {rng.randrange(30)}', '2025-01-01', obj_num)
+            elif choice < 0.55:
+                tasks.delete(rng.randint(1, size), obj_num)
+            elif choice < 0.7:
+                tasks.modify_name(f'task {rng.randrange(30)}', rng.randint(1, size), obj_num)
+            elif choice < 0.8:
+                tasks.delete_many(f'{rng.randint(1, size)}-{rng.randint(1, size)}', obj_num)
+            elif choice < 0.95:
+                tasks.move(str(rng.randint(1, size)), obj_num, rng.randint(1, count))
+            else:
+                tasks.clear(obj_num)
+
+        user_data = db.user_data
+        built = TitleIndex(user_data)
+        for prefix in ['objective 1', 'task', 'task 1', 'task 2']:
+            assert index.objective_number(prefix, user_data) == \
+                built.objective_number(prefix, user_data)
+            for obj_num in range(1, len(user_data['objectives']) + 1):
+                assert index.task_number(obj_num, prefix, user_data) == \
+                    built.task_number(obj_num, prefix, user_data)
+        assert not index._stale
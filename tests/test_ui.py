@@ -0,0 +1,83 @@
+"""Tests of the view of the tasks page: sorting, filtering and mapping the
+shown task numbers back to the ones in the objective."""
+
+import datetime
+
+import pytest
+
+from domain.models.dates import parse_date
+from domain.models.logic import TasksManager
+from domain.models.UI import TasksUIList
+
+
+def tasks_list():
+    tasks = [
+        {'title': 'write essay', 'due_date': '2025-03-01'},
+        {'title': 'Buy paper', 'due_date': 'some day'},
+        {'title': 'read book', 'due_date': '2025-01-15'},
+        {'title': 'essay outline', 'due_date': '2025-02-01'},
+        {'title': 'call Ann', 'due_date': '10.01.2025'},
+    ]
+    tasks_list = TasksUIList({'user_name': 'ann', 'objectives': [{'title': 'exam', 'tasks': tasks}]})
+    tasks_list.obj_num = '1'
+    return tasks_list
+
+
+def test_no_view_keeps_the_numbers():
+    tasks = tasks_list()
+    assert tasks.order() == [0, 1, 2, 3, 4]
+    assert tasks.to_storage('5,1-2') == '5,1-2'
+
+
+def test_sort_by_due_date_puts_the_undated_last():
+    tasks = tasks_list()
+    tasks.set_view('due')
+    assert tasks.order() == [4, 2, 3, 0, 1]
+    assert tasks.to_storage('1') == '5'
+    assert tasks.to_storage('2-3, 5') == '3,4,2'
+
+
+def test_sort_by_title_ignores_the_case():
+    tasks = tasks_list()
+    tasks.set_view('title')
+    assert tasks.order() == [1, 4, 3, 2, 0]
+
+
+def test_sort_and_filter():
+    tasks = tasks_list()
+    first, last = datetime.date(2025, 1, 12), datetime.date(2025, 12, 31)
+    tasks.set_view('due', 'ESSAY', (first, last))
+    assert tasks.order() == [3, 0]
+    # The numbers that are not shown are left out.
+    assert tasks.to_storage('2,1,3') == '1,4'
+
+    tasks.set_view('title', None, (None, datetime.date(2025, 1, 31)))
+    assert tasks.order() == [4, 2]
+    assert tasks.to_storage('1-2') == '5,3'
+
+
+def test_order_is_computed_again_after_invalidate():
+    tasks = tasks_list()
+    tasks.set_view('due')
+    assert tasks.order()[0] == 4
+    tasks.user_data['objectives'][0]['tasks'][4]['due_date'] = '2026-01-01'
+    tasks.invalidate()
+    assert tasks.order() == [2, 3, 0, 4, 1]
+
+
+def test_unknown_sort_key():
+    with pytest.raises(ValueError):
+        tasks_list().set_view('size')
+
+
+def test_parse_numbers():
+    assert TasksManager.parse_numbers('3, 1,5-7,') == [3, 1, 5, 6, 7]
+    with pytest.raises(ValueError):
+        TasksManager.parse_numbers('1-')
+
+
+def test_parse_date():
+    today = datetime.date(2025, 6, 15)
+    assert parse_date(' 15.06.2025 ', today) == today
+    assert parse_date('Yesterday', today) == today - datetime.timedelta(days=1)
+    assert parse_date('2025-02-30', today) is None